@@ -0,0 +1,95 @@
+"""
+Fast HS* JWT decode path
+
+Kept free of module state and fully annotated so it can be compiled
+ahead of time with mypyc (`mypyc auth/jwt_fast.py`); the resulting
+extension module is picked up by the normal import in place of this file.
+"""
+import base64
+import hashlib
+import hmac
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+
+HMAC_DIGESTS: Dict[str, Callable[..., Any]] = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+
+def b64url_decode(segment: str) -> bytes:
+    """Decode unpadded base64url (RFC 7515)"""
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def check_signature(
+    signing_bytes: bytes, signature: bytes, digestmod: Callable[..., Any], keys: List[bytes], first: int
+) -> int:
+    """Return index of the key that produced the signature (-1 if none), trying `first` first"""
+    count = len(keys)
+    if count == 0:
+        return -1
+    if first >= count:
+        first = 0
+    if hmac.compare_digest(hmac.new(keys[first], signing_bytes, digestmod).digest(), signature):
+        return first
+    for idx in range(count):
+        if idx != first and hmac.compare_digest(hmac.new(keys[idx], signing_bytes, digestmod).digest(), signature):
+            return idx
+    return -1
+
+
+def decode(
+    token: str,
+    algorithm: str,
+    keys: List[bytes],
+    first: int,
+    now: float,
+    digest_cache: Optional[Dict[bytes, Tuple[bytes, bytes]]] = None,
+    digest_cache_max: int = 10000,
+) -> Tuple[Optional[dict], int]:
+    """Verify signature, alg and exp of a compact JWT.
+
+    Returns (payload, matching key index); payload is None when the token
+    is malformed, forged or expired. `digest_cache` maps a signing input to
+    its verified (signature, key) so repeats skip the HMAC computation.
+    """
+    digestmod = HMAC_DIGESTS.get(algorithm)
+    if digestmod is None:
+        return None, -1
+    try:
+        signing_input, _, signature_b64 = token.rpartition(".")
+        header_b64, _, payload_b64 = signing_input.partition(".")
+        if not header_b64 or not payload_b64 or not signature_b64:
+            return None, -1
+        header = orjson.loads(b64url_decode(header_b64))
+        if not isinstance(header, dict) or header.get("alg") != algorithm:
+            return None, -1
+        signature = b64url_decode(signature_b64)
+        signing_bytes = signing_input.encode("ascii")
+
+        cached = digest_cache.get(signing_bytes) if digest_cache is not None else None
+        if cached is not None and cached[1] in keys and hmac.compare_digest(cached[0], signature):
+            idx = keys.index(cached[1])
+        else:
+            idx = check_signature(signing_bytes, signature, digestmod, keys, first)
+            if idx < 0:
+                return None, -1
+            if digest_cache is not None:
+                # Plain dict: single ops are atomic under the GIL; reset when full
+                if len(digest_cache) >= digest_cache_max:
+                    digest_cache.clear()
+                digest_cache[signing_bytes] = (signature, keys[idx])
+
+        payload = orjson.loads(b64url_decode(payload_b64))
+    except (ValueError, UnicodeError):
+        return None, -1
+
+    if not isinstance(payload, dict):
+        return None, idx
+    exp = payload.get("exp")
+    if not isinstance(exp, (int, float)) or exp <= now:
+        return None, idx
+    return payload, idx
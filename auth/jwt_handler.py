@@ -1,14 +1,50 @@
 """
 JWT token handling for authentication
 """
-from datetime import datetime, timedelta, timezone
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from datetime import timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from config import JWT_SECRET_KEYS, JWT_ALGORITHM, JWT_ACCESS_TOKEN_EXPIRE_MINUTES
+import bcrypt
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from cachetools import TTLCache
+import jwt
+from auth import jwt_fast
+from config import (
+    JWT_SECRET_KEYS, JWT_ALGORITHM, JWT_ACCESS_TOKEN_EXPIRE_MINUTES, JWT_VERIFY_CACHE_TTL,
+    ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM
+)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
+# Password hashing: argon2-cffi (native libargon2) for new hashes,
+# bcrypt only to verify legacy hashes
+password_hasher = PasswordHasher(
+    time_cost=ARGON2_TIME_COST,
+    memory_cost=ARGON2_MEMORY_COST,
+    parallelism=ARGON2_PARALLELISM,
+)
+
+# Signing keys as bytes, prepared once instead of per decode attempt
+_KEYS_BYTES = [k.encode() if isinstance(k, str) else k for k in JWT_SECRET_KEYS]
+# Index of the key that verified the last token; tried first on the next call
+# so tokens signed with the newest key don't pay for a rotated-out key first
+_last_ok_idx = 0
+# Signing input -> (verified signature, key); lets repeats skip the HMAC itself
+_sig_cache = {}
+
+# Verified payloads keyed by SHA-256 of the raw token (the token itself is never stored)
+_verify_cache = TTLCache(maxsize=10000, ttl=JWT_VERIFY_CACHE_TTL)
+_verify_lock = threading.Lock()
+
+# Recently verified (password, hash) pairs. Keys are HMACs under a per-process
+# secret so the cache never holds a plain fast hash of a password; only
+# successful checks are stored, so repeated wrong guesses still pay full cost.
+_pw_cache = TTLCache(maxsize=1024, ttl=60)
+_pw_cache_secret = secrets.token_bytes(32)
+_pw_lock = threading.Lock()
 
 class JWTHandler:
     """Handle JWT token operations with key rotation support"""
@@ -20,39 +56,103 @@ class JWTHandler:
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
         """Verify a password against its hash"""
-        return pwd_context.verify(plain_password, hashed_password)
+        cache_key = hmac.new(
+            _pw_cache_secret,
+            plain_password.encode() + b"\0" + hashed_password.encode(),
+            hashlib.sha256,
+        ).digest()
+        with _pw_lock:
+            if _pw_cache.get(cache_key):
+                return True
+        ok = JWTHandler._check_password(plain_password, hashed_password)
+        if ok:
+            with _pw_lock:
+                _pw_cache[cache_key] = True
+        return ok
+
+    @staticmethod
+    def _check_password(plain_password: str, hashed_password: str) -> bool:
+        """Run the actual hash check for argon2 or legacy bcrypt hashes"""
+        if hashed_password.startswith("$argon2"):
+            try:
+                return password_hasher.verify(hashed_password, plain_password)
+            except (VerificationError, InvalidHashError):
+                return False
+        try:
+            return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+        except ValueError:
+            return False
 
     @staticmethod
     def get_password_hash(password: str) -> str:
         """Hash a password"""
-        return pwd_context.hash(password)
+        return password_hasher.hash(password)
+
+    @staticmethod
+    def password_needs_rehash(hashed_password: str) -> bool:
+        """Legacy bcrypt hashes and argon2 hashes with outdated parameters need rehashing"""
+        if not hashed_password.startswith("$argon2"):
+            return True
+        try:
+            return password_hasher.check_needs_rehash(hashed_password)
+        except InvalidHashError:
+            return True
 
     @staticmethod
     def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         """Create JWT access token"""
         to_encode = data.copy()
-        expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=JWTHandler.ACCESS_TOKEN_EXPIRE_MINUTES))
-
-        to_encode.update({"exp": expire})
+        if expires_delta is not None:
+            expire_seconds = int(expires_delta.total_seconds())
+        else:
+            expire_seconds = JWTHandler.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        to_encode["exp"] = int(time.time()) + expire_seconds
         signing_key = JWTHandler.SECRET_KEYS[0]
         encoded_jwt = jwt.encode(to_encode, signing_key, algorithm=JWTHandler.ALGORITHM)
         return encoded_jwt
 
     @staticmethod
     def verify_token(token: str) -> Optional[dict]:
-        """Verify and decode JWT token"""
-        try:
-            last_error = None
-            for key in JWTHandler.SECRET_KEYS:
-                try:
-                    return jwt.decode(token, key, algorithms=[JWTHandler.ALGORITHM])
-                except JWTError as e:
-                    last_error = e
-                    continue
+        """Verify and decode JWT token (successful results are cached briefly)"""
+        if not token:
             return None
-        except JWTError:
+        cache_key = hashlib.sha256(token.encode()).digest()
+        with _verify_lock:
+            payload = _verify_cache.get(cache_key)
+        if payload is not None:
+            # Never serve a token that expired while sitting in the cache
+            if payload.get("exp", 0) > time.time():
+                return payload
+            with _verify_lock:
+                _verify_cache.pop(cache_key, None)
             return None
 
+        payload = JWTHandler._decode(token)
+        if payload and payload.get("exp", 0) > time.time():
+            with _verify_lock:
+                _verify_cache[cache_key] = payload
+        return payload
+
+    @staticmethod
+    def forget_token(token: str) -> None:
+        """Drop a token from the verification cache (e.g. on logout)"""
+        if not token:
+            return
+        cache_key = hashlib.sha256(token.encode()).digest()
+        with _verify_lock:
+            _verify_cache.pop(cache_key, None)
+
+    @staticmethod
+    def _decode(token: str) -> Optional[dict]:
+        """Decode an HMAC-signed token trying every configured key (see auth.jwt_fast)"""
+        global _last_ok_idx
+        payload, idx = jwt_fast.decode(
+            token, JWTHandler.ALGORITHM, _KEYS_BYTES, _last_ok_idx, time.time(), _sig_cache
+        )
+        if idx >= 0:
+            _last_ok_idx = idx
+        return payload
+
     @staticmethod
     def get_current_user(token: str) -> Optional[dict]:
         """Get current user from token"""
@@ -1,16 +1,26 @@
-from typing import Optional
+from typing import Optional, Tuple
+from contextlib import asynccontextmanager
+import anyio
 from fastapi import FastAPI, HTTPException, Depends, Form, Request
-from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse, Response
-import json
+from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse, Response, ORJSONResponse
+import orjson
+import re
 from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.templating import Jinja2Templates
-from starlette.middleware.sessions import SessionMiddleware
+import jinja2
+from markupsafe import escape
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 import os
 import sys
+import math
 import time
-from datetime import datetime, timezone, timedelta
-from collections import defaultdict
+from datetime import date, datetime, timezone, timedelta
+from functools import lru_cache
+import asyncio
+from collections import defaultdict, deque
+from cachetools import TTLCache
 from pathlib import Path
 # Add project root to path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -18,9 +28,9 @@ sys.path.insert(0, project_root)
 
 from config import (
     BOT_USERNAME,
-    API_HOST, API_PORT, QR_UPDATE_INTERVAL, SECRET_KEY, SESSION_SECRET_KEY, API_KEY, DB_PATH
+    API_HOST, API_PORT, API_WORKERS, API_THREADPOOL_SIZE, API_ACCESS_LOG, QR_UPDATE_INTERVAL, SECRET_KEY, SESSION_SECRET_KEY, API_KEY, DB_PATH
 )
-from config.config import ADMIN_IP_WHITELIST, TIMEZONE
+from config.config import ADMIN_IP_WHITELIST, TIMEZONE, PROFILING_ENABLED, TEMPLATES_AUTO_RELOAD, REDIS_ENABLED, ANALYTICS_DB_CONCURRENCY
 from database import Database
 from auth.jwt_handler import JWTHandler
 from backend.schemas import (
@@ -35,12 +45,16 @@ from utils.logger import (
     log_unauthorized_access, log_data_export
 )
 from utils.cache import cache
+from utils.metrics import get_system_metrics, get_redis_metrics, get_database_metrics, iso_now
 from utils.validators import (
     validate_username, validate_password, validate_fio, validate_role,
     validate_department, validate_position, sanitize_string
 )
-from utils.rate_limit import rate_limit
-from utils.csrf import set_csrf_token, get_csrf_token, require_csrf_token
+from utils.rate_limit import rate_limit, get_client_ip
+from utils.session import CachedSessionMiddleware
+from utils.responses import AnalyticsJSONResponse
+from utils.singleflight import SingleFlight
+from utils.csrf import set_csrf_token, ensure_csrf_token, require_csrf_token
 from utils.time_formatter import format_hours_to_hhmm
 from backend.export_pivot import (
     build_pivot_xlsx,
@@ -49,6 +63,18 @@ from backend.export_pivot import (
     save_pivot_xlsx_to_path,
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks"""
+    # Хэширование паролей и SQLite уходят в threadpool — расширяем лимит anyio
+    anyio.to_thread.current_default_thread_limiter().total_tokens = API_THREADPOOL_SIZE
+    # Компилируем шаблоны заранее, чтобы первый запрос не платил за парсинг
+    for name in templates.env.list_templates(extensions=["html"]):
+        templates.env.get_template(name)
+    _terminal_shell()
+    _login_blocked_shell()
+    yield
+
 app = FastAPI(
     title="Attendance System API",
     description="""
@@ -93,6 +119,8 @@ app = FastAPI(
     - `503` - Сервис недоступен (health check)
     """,
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     contact={
         "name": "Attendance System Support",
     },
@@ -126,39 +154,117 @@ app = FastAPI(
 
 # Add session middleware (use dedicated session secret, defaulting to SECRET_KEY)
 # max_age=31536000 = 1 year in seconds for long-lived sessions (terminal)
-app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET_KEY, max_age=31536000)
+app.add_middleware(CachedSessionMiddleware, secret_key=SESSION_SECRET_KEY, max_age=31536000)
+
+# Compress larger responses (analytics JSON, admin/analytics/users pages); small token polls stay as-is
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# Request profiling for finding hot paths (off by default, see config PROFILING_ENABLED)
+if PROFILING_ENABLED:
+    from utils.profiling import ProfilerMiddleware
+    app.add_middleware(ProfilerMiddleware)
+
+# Role groups for access checks (frozenset: O(1) membership, built once)
+ADMIN_ROLES = frozenset({"admin", "manager", "hr"})
+TERMINAL_ROLES = ADMIN_ROLES | {"terminal"}
+USER_MGMT_ROLES = frozenset({"admin", "manager"})
+SUPERADMIN_ROLES = frozenset({"admin"})
+STAFF_ROLES = ADMIN_ROLES | {"user"}
+
+# Upper bound for /api/analytics/users?limit=
+ANALYTICS_USERS_MAX_LIMIT = 200
+# Одинаковые параллельные запросы аналитики выполняют один запрос к БД;
+# число одновременных запросов к БД ограничено ANALYTICS_DB_CONCURRENCY
+ANALYTICS_FLIGHT = SingleFlight(max_concurrent=ANALYTICS_DB_CONCURRENCY)
+
+# Form/JSON string values accepted as boolean true
+TRUTHY_STRINGS = frozenset({"true", "1", "yes", "on"})
 
 # Login rate limiter (Redis + fallback memory)
 MAX_LOGIN_ATTEMPTS = 5
 LOGIN_WINDOW_SEC = 300  # 5 minutes
 LOGIN_BLOCK_SEC = 900   # block 15 minutes
-LOGIN_ATTEMPTS = defaultdict(list)
+# Memory fallback: last MAX_LOGIN_ATTEMPTS failure timestamps (time.monotonic) per IP in a
+# bounded ring buffer; an IP is evicted LOGIN_WINDOW_SEC after its newest failure
+LOGIN_ATTEMPTS_MAX_IPS = 100_000
+LOGIN_ATTEMPTS = TTLCache(maxsize=LOGIN_ATTEMPTS_MAX_IPS, ttl=LOGIN_WINDOW_SEC)
+
+
+# Redis path: block key + sliding-window log (ZSET) checked and updated atomically
+# in one round-trip, shared by every worker. Returns {count, retry_after}: count is -1
+# while blocked, otherwise the number of attempts inside the window (this one
+# included); over the limit the script sets the block key itself.
+_LOGIN_LUA = """
+local ttl = redis.call('TTL', KEYS[1])
+if ttl ~= -2 then return {-1, math.max(ttl, 1)} end
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], 0, now - window)
+redis.call('ZADD', KEYS[2], now, ARGV[4])
+redis.call('PEXPIRE', KEYS[2], window)
+local count = redis.call('ZCARD', KEYS[2])
+if count > tonumber(ARGV[3]) then
+    redis.call('SET', KEYS[1], 1, 'EX', ARGV[5])
+    return {count, tonumber(ARGV[5])}
+end
+return {count, 0}
+"""
+_login_script = None
+
+
+def _redis_login_attempt(client_ip: str, now: float) -> Tuple[int, int]:
+    """Count a login attempt in Redis (EVALSHA, reloaded automatically after a Redis restart)
+
+    Returns (count, retry_after seconds); count is -1 while the IP is blocked.
+    """
+    global _login_script
+    if _login_script is None:
+        _login_script = cache.redis_client.register_script(_LOGIN_LUA)
+    count, retry_after = _login_script(
+        keys=[f"login:block:{client_ip}", f"login:win:{client_ip}"],
+        args=[int(now * 1000), LOGIN_WINDOW_SEC * 1000, MAX_LOGIN_ATTEMPTS,
+              f"{int(now * 1000)}:{os.urandom(4).hex()}", LOGIN_BLOCK_SEC],
+    )
+    return int(count), int(retry_after)
+
 
+def _login_retry_after_in_memory(client_ip: str, now: float) -> int:
+    """Seconds until the IP may retry, 0 if not blocked
+
+    Blocked while MAX_LOGIN_ATTEMPTS failures are inside LOGIN_WINDOW_SEC
+    (the oldest kept one is in the window).
+    """
+    attempts = LOGIN_ATTEMPTS.get(client_ip)
+    if not attempts or len(attempts) < MAX_LOGIN_ATTEMPTS:
+        return 0
+    remaining = attempts[0] + LOGIN_WINDOW_SEC - now
+    return math.ceil(remaining) if remaining > 0 else 0
+
+
+def _record_failed_login(client_ip: str, now: float) -> None:
+    if cache.redis_client:
+        # Redis counter already counted this attempt
+        return
+    # No await inside: runs atomically on the event loop, no lock needed
+    attempts = LOGIN_ATTEMPTS.get(client_ip)
+    if attempts is None:
+        attempts = deque(maxlen=MAX_LOGIN_ATTEMPTS)
+    attempts.append(now)
+    # Re-set to restart the TTL from the newest failure
+    LOGIN_ATTEMPTS[client_ip] = attempts
 
-def _is_trusted_proxy(ip: str) -> bool:
-    """Check if IP belongs to a trusted proxy (Docker/local network)"""
-    return ip in ("127.0.0.1", "::1") or ip.startswith(("172.", "10.", "192.168."))
 
 def check_ip_whitelist(request: Request) -> bool:
     """Проверить IP адрес против whitelist администраторов"""
     if not ADMIN_IP_WHITELIST:
         return True  # Если whitelist не настроен, разрешаем всем
     
-    client_ip = request.client.host if request.client else None
-    if not client_ip:
-        return False
-    
-    # Only trust X-Forwarded-For from known reverse proxies (Angie/Docker network)
-    if _is_trusted_proxy(client_ip):
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            client_ip = forwarded_for.split(",")[0].strip()
-    
-    return client_ip in ADMIN_IP_WHITELIST
+    # X-Forwarded-For is trusted only from known reverse proxies
+    return get_client_ip(request) in ADMIN_IP_WHITELIST
 
 def authorize_request(
     request: Request,
-    require_roles: list[str] | None = None,
+    require_roles: frozenset[str] | None = None,
     allow_terminal_session: bool = False,
 ):
     """Authorize API requests.
@@ -180,19 +286,25 @@ def authorize_request(
 
     # Session or bearer token
     token = request.session.get("access_token")
+    from_session = bool(token)
     if not token:
         auth_header = request.headers.get("Authorization", "")
         if auth_header.startswith("Bearer "):
-            token = auth_header.split(" ", 1)[1]
+            token = auth_header[7:]
 
     if not token:
-        client_ip = request.client.host if request.client else "unknown"
+        client_ip = get_client_ip(request)
         log_unauthorized_access(str(request.url.path), ip_address=client_ip, reason="No token provided")
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    payload = JWTHandler.verify_token(token)
+    # Session token may already be verified by get_session_user for this request
+    payload = getattr(request.state, "session_user", None) if from_session else None
+    if payload is None:
+        payload = JWTHandler.verify_token(token)
+        if from_session:
+            request.state.session_user = payload
     if not payload:
-        client_ip = request.client.host if request.client else "unknown"
+        client_ip = get_client_ip(request)
         log_unauthorized_access(str(request.url.path), ip_address=client_ip, reason="Invalid token")
         raise HTTPException(status_code=401, detail="Unauthorized")
 
@@ -202,13 +314,13 @@ def authorize_request(
     # Проверка IP whitelist для администраторов
     if require_roles and "admin" in require_roles and role == "admin":
         if not check_ip_whitelist(request):
-            client_ip = request.client.host if request.client else "unknown"
+            client_ip = get_client_ip(request)
             log_unauthorized_access(str(request.url.path), user=username, ip_address=client_ip, reason="IP not in admin whitelist")
             raise HTTPException(status_code=403, detail="Forbidden: IP address not allowed")
     
     if require_roles and role not in require_roles:
-        client_ip = request.client.host if request.client else "unknown"
-        log_unauthorized_access(str(request.url.path), user=username, ip_address=client_ip, reason=f"Insufficient permissions: role '{role}' not in {require_roles}")
+        client_ip = get_client_ip(request)
+        log_unauthorized_access(str(request.url.path), user=username, ip_address=client_ip, reason=f"Insufficient permissions: role '{role}' not in {sorted(require_roles)}")
         raise HTTPException(status_code=403, detail="Forbidden")
 
     return payload
@@ -223,7 +335,15 @@ if STATIC_DIR.exists():
     app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
 # Templates
-templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+# Compiled templates are kept in memory (no per-render stat unless TEMPLATES_AUTO_RELOAD)
+# and as bytecode in the temp dir, so restarts skip the parse/compile step
+templates = Jinja2Templates(env=jinja2.Environment(
+    loader=jinja2.FileSystemLoader(str(TEMPLATES_DIR)),
+    autoescape=True,
+    auto_reload=TEMPLATES_AUTO_RELOAD,
+    cache_size=400,
+    bytecode_cache=jinja2.FileSystemBytecodeCache(),
+))
 
 # Add custom Jinja2 filters
 def format_hours_filter(hours: float) -> str:
@@ -257,10 +377,35 @@ templates.env.filters["utc_to_local"] = utc_ts_to_local_filter
 # Database instance
 db = Database(str(DB_PATH))
 
+BOT_START_URL = f"https://t.me/{BOT_USERNAME}?start="
+
 # Dependency to get database
 def get_db():
     return db
 
+_NO_SESSION_USER = object()
+
+async def get_session_user(request: Request) -> Optional[dict]:
+    """JWT payload of the session user, verified once per request (memoized on request.state)"""
+    cached = getattr(request.state, "session_user", _NO_SESSION_USER)
+    if cached is not _NO_SESSION_USER:
+        return cached
+    payload = None
+    token = request.session.get("access_token")
+    if token:
+        try:
+            payload = JWTHandler.verify_token(token)
+        except Exception as e:
+            log_error(e, "Session token validation")
+    request.state.session_user = payload
+    return payload
+
+def login_redirect(request: Request) -> RedirectResponse:
+    """Redirect to login, dropping a session whose token is invalid or expired"""
+    if request.session.get("access_token"):
+        request.session.clear()
+    return RedirectResponse(url="/login", status_code=302)
+
 
 def _parse_report_period(
     period: Optional[str],
@@ -292,42 +437,49 @@ def _parse_report_period(
         raise HTTPException(status_code=400, detail="Either period or start_date+end_date must be provided")
     return start, end
 
-def build_terminal_context(request: Request, db: Database) -> dict:
-    """Prepare context for the public terminal page"""
-    token_data = db.get_active_token()
-    token = token_data['token'] if token_data else db.create_token()
-    url = f"https://t.me/{BOT_USERNAME}?start={token}"
+USER_RESPONSE_FIELDS = tuple(UserResponse.model_fields)
 
-    # Проверяем авторизацию для отображения админских ссылок (если пользователь уже логинился)
-    user_info = None
-    try:
-        jwt_token = request.session.get("access_token")
-        if jwt_token:
-            payload = JWTHandler.verify_token(jwt_token)
-            if payload:
-                username = payload.get("sub")
-                user = None
-                if username:
-                    user = db.get_web_user_by_username(username)
-                if user:
-                    user_info = {
-                        "username": username,
-                        "role": user.get("role", "user"),
-                        "is_admin": user.get("role") in ["admin", "manager", "hr"]
-                    }
-    except Exception:
-        # если токен невалиден, просто показываем публичную страницу
-        pass
+def user_response(user: dict) -> ORJSONResponse:
+    """UserResponse-shaped JSON built directly (only public fields, no password hash), skipping validation"""
+    data = {field: user.get(field) for field in USER_RESPONSE_FIELDS}
+    data["is_active"] = bool(data["is_active"])
+    return ORJSONResponse(data)
 
-    return {
-            "request": request,
-            "token": token,
-            "url": url,
-            "bot_url": url,
-            "update_interval": QR_UPDATE_INTERVAL * 1000,
-            "user_info": user_info,
-            "active_nav": "terminal",
-        }
+async def fetch_active_token(db: Database) -> dict:
+    """Active token lookup off the event loop (SQLite/Redis calls are blocking)
+
+    No per-process memo here: the bot marks tokens used from another process,
+    so token state is only shared through utils.cache (get_or_create_active_token).
+    """
+    token_data = await run_in_threadpool(db.get_or_create_active_token)
+    return {**token_data, "url": bot_start_url(token_data["token"])}
+
+def bot_start_url(token: str) -> str:
+    """Deep link that starts the bot with the attendance token"""
+    return BOT_START_URL + token
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check If-None-Match against an ETag (weak comparison, RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+@lru_cache(maxsize=1)
+def _terminal_shell() -> bytes:
+    """terminal.html rendered once: it has no per-request data (token is polled via /api/active_token)"""
+    return templates.env.get_template("terminal.html").render(
+        update_interval=QR_UPDATE_INTERVAL * 1000,
+        active_nav="terminal",
+    ).encode("utf-8")
+
+def terminal_response() -> HTMLResponse:
+    """Pre-rendered terminal page (re-rendered per request while templates auto-reload)"""
+    if TEMPLATES_AUTO_RELOAD:
+        _terminal_shell.cache_clear()
+    return HTMLResponse(_terminal_shell())
 
 
 @app.get(
@@ -362,10 +514,17 @@ async def get_active_token(request: Request, db: Database = Depends(get_db)):
     # Терминал теперь требует авторизацию, поэтому убираем allow_terminal_session
     authorize_request(request, allow_terminal_session=False)
 
-    token_data = db.get_active_token()
-    token = token_data['token'] if token_data else db.create_token()
-    url = f"https://t.me/{BOT_USERNAME}?start={token}"
-    return {"token": token, "url": url, "bot_url": url}
+    token_data = await fetch_active_token(db)
+    token = token_data['token']
+    # Токен меняется не чаще раза в QR_UPDATE_INTERVAL: отдаём ETag, повторный опрос получает 304
+    headers = {
+        "ETag": f'"{token}"',
+        "Cache-Control": f"private, max-age={QR_UPDATE_INTERVAL // 2}",
+    }
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    url = token_data['url']
+    return ORJSONResponse({"token": token, "url": url, "bot_url": url}, headers=headers)
 
 @app.get("/api/token")
 async def get_token_for_device(request: Request, db: Database = Depends(get_db)):
@@ -390,43 +549,66 @@ async def get_token_for_device(request: Request, db: Database = Depends(get_db))
         if header_key != API_KEY:
             raise HTTPException(status_code=401, detail="Invalid API key")
     
-    token_data = db.get_active_token()
-    token = token_data['token'] if token_data else db.create_token()
-    url = f"https://t.me/{BOT_USERNAME}?start={token}"
-    
+    token_data = await fetch_active_token(db)
+    token, url = token_data['token'], token_data['url']
+    # Устройство может вернуть ETag в If-None-Match и получить 304 без тела
+    headers = {
+        "ETag": f'"{token}"',
+        "Cache-Control": f"private, max-age={QR_UPDATE_INTERVAL // 2}",
+    }
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
     # Include token creation timestamp for change detection
-    if token_data:
-        created_at = token_data.get('created_at', '')
-    else:
-        # If we just created a token, get it again to include timestamp
-        token_data = db.get_active_token()
-        created_at = token_data.get('created_at', '') if token_data else ''
+    created_at = token_data.get('created_at', '')
     
-    return {
+    return ORJSONResponse({
         "token": token,
         "url": url,
         "bot_username": BOT_USERNAME,
         "created_at": created_at  # ISO format timestamp for change detection
-    }
+    }, headers=headers)
 
 # Web terminal routes
 @app.get("/", response_class=HTMLResponse)
-async def home(request: Request, db: Database = Depends(get_db)):
+async def home(request: Request):
     """Главная: терминал с QR-кодом (доступен ролям terminal, admin, manager, hr)"""
     if not request.session.get("authenticated"):
         return RedirectResponse(url="/login?next=/", status_code=302)
     user_role = request.session.get("user_role")
-    if user_role not in ["terminal", "admin", "manager", "hr"]:
+    if user_role not in TERMINAL_ROLES:
         return RedirectResponse(url="/me", status_code=302)
-    context = build_terminal_context(request, db)
-    return templates.TemplateResponse("terminal.html", context)
+    return terminal_response()
+
+# Blocked-login page rendered once; only the escaped next_url/CSRF token are substituted
+_BLOCKED_NEXT_URL = "__NEXT_URL__"
+_BLOCKED_CSRF_TOKEN = "__CSRF_TOKEN__"
+
+@lru_cache(maxsize=1)
+def _login_blocked_shell() -> str:
+    return templates.env.get_template("login.html").render(
+        error="Слишком много попыток. Попробуйте позже.",
+        next_url=_BLOCKED_NEXT_URL,
+        csrf_token=_BLOCKED_CSRF_TOKEN,
+    )
+
+def login_blocked_response(request: Request, next_url: str, retry_after: int = LOGIN_BLOCK_SEC) -> HTMLResponse:
+    """429 login page for rate-limited clients, without a Jinja render"""
+    if TEMPLATES_AUTO_RELOAD:
+        _login_blocked_shell.cache_clear()
+    csrf_token = ensure_csrf_token(request)
+    body = (
+        _login_blocked_shell()
+        .replace(_BLOCKED_NEXT_URL, str(escape(next_url or "/terminal")), 1)
+        .replace(_BLOCKED_CSRF_TOKEN, str(escape(csrf_token)), 1)
+    )
+    return HTMLResponse(body, status_code=429, headers={"Retry-After": str(retry_after)})
 
 @app.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
     """Страница входа с поддержкой редиректа после логина"""
     next_url = request.query_params.get("next", "/terminal")
-    # Генерируем CSRF токен для формы логина
-    csrf_token = set_csrf_token(request)
+    # CSRF токен сессии (новый создаётся только если его ещё нет)
+    csrf_token = ensure_csrf_token(request)
     return templates.TemplateResponse("login.html", {
         "request": request,
         "next_url": next_url,
@@ -449,7 +631,7 @@ async def login(
     username = sanitize_string(username, max_length=50)
     is_valid, error_msg = validate_username(username)
     if not is_valid:
-        csrf_token = get_csrf_token(request) or set_csrf_token(request)
+        csrf_token = ensure_csrf_token(request)
         return templates.TemplateResponse(
             "login.html",
             {"request": request, "error": error_msg, "next_url": next_url, "csrf_token": csrf_token}
@@ -457,77 +639,44 @@ async def login(
     
     is_valid, error_msg = validate_password(password, min_length=6, require_complexity=False)
     if not is_valid:
-        csrf_token = get_csrf_token(request) or set_csrf_token(request)
+        csrf_token = ensure_csrf_token(request)
         return templates.TemplateResponse(
             "login.html",
             {"request": request, "error": error_msg, "next_url": next_url, "csrf_token": csrf_token}
         )
     
     # Rate limit by client IP
-    client_ip = request.client.host if request.client else "unknown"
-    now = time.time()
+    client_ip = get_client_ip(request)
+    # Redis window is shared by all workers -> wall clock; memory fallback -> monotonic
+    now = time.time() if cache.redis_client else time.monotonic()
 
     # Redis-based limiter (fallback to memory)
     try:
         if cache.redis_client:
-            key_block = f"login:block:{client_ip}"
-            key_counter = f"login:count:{client_ip}"
-
-            if cache.redis_client.exists(key_block):
-                return templates.TemplateResponse(
-                    "login.html",
-                    {
-                        "request": request,
-                        "error": "Слишком много попыток. Попробуйте позже.",
-                        "next_url": next_url,
-                        "csrf_token": get_csrf_token(request) or set_csrf_token(request),
-                    }
-                )
-
-            count = cache.redis_client.incr(key_counter)
-            if count == 1:
-                cache.redis_client.expire(key_counter, LOGIN_WINDOW_SEC)
-            if count > MAX_LOGIN_ATTEMPTS:
-                cache.redis_client.set(key_block, 1, ex=LOGIN_BLOCK_SEC)
-                log_rate_limit_exceeded("/login", client_ip, attempts=count)
-                return templates.TemplateResponse(
-                    "login.html",
-                    {
-                        "request": request,
-                        "error": "Слишком много попыток. Попробуйте позже.",
-                        "next_url": next_url,
-                        "csrf_token": get_csrf_token(request) or set_csrf_token(request),
-                    }
-                )
+            count, retry_after = _redis_login_attempt(client_ip, now)
+            if retry_after:
+                if count > 0:
+                    log_rate_limit_exceeded("/login", client_ip, attempts=count)
+                return login_blocked_response(request, next_url, retry_after)
         else:
-            # Use get() to avoid KeyError if key doesn't exist
-            attempts = LOGIN_ATTEMPTS.get(client_ip, [])
-            LOGIN_ATTEMPTS[client_ip] = [t for t in attempts if now - t < LOGIN_WINDOW_SEC]
-            if len(LOGIN_ATTEMPTS.get(client_ip, [])) >= MAX_LOGIN_ATTEMPTS:
-                log_rate_limit_exceeded("/login", client_ip, attempts=len(LOGIN_ATTEMPTS.get(client_ip, [])))
-                return templates.TemplateResponse(
-                    "login.html",
-                    {
-                        "request": request,
-                        "error": "Слишком много попыток. Попробуйте позже.",
-                        "next_url": next_url,
-                        "csrf_token": get_csrf_token(request) or set_csrf_token(request),
-                    }
-                )
+            retry_after = _login_retry_after_in_memory(client_ip, now)
+            if retry_after:
+                log_rate_limit_exceeded("/login", client_ip, attempts=MAX_LOGIN_ATTEMPTS)
+                return login_blocked_response(request, next_url, retry_after)
     except Exception as e:
         # Log rate limiting errors but don't block login
         log_error(e, "Rate limiting")
 
     # Попытка логина через API
     try:
-        # Используем authenticate_web_user, который обновляет last_login
-        user = db.authenticate_web_user(username, password)
+        # Используем authenticate_web_user, который обновляет last_login;
+        # проверка хэша пароля занимает ~100ms CPU, поэтому не блокируем event loop
+        user = await run_in_threadpool(db.authenticate_web_user, username, password)
         if user:
             # Сброс счетчика попыток при успехе
             try:
                 if cache.redis_client:
-                    cache.redis_client.delete(f"login:count:{client_ip}")
-                    cache.redis_client.delete(f"login:block:{client_ip}")
+                    cache.redis_client.delete(f"login:win:{client_ip}", f"login:block:{client_ip}")
                 else:
                     LOGIN_ATTEMPTS.pop(client_ip, None)
             except Exception as e:
@@ -561,40 +710,34 @@ async def login(
             redirect_to = next_url if next_url and next_url.startswith("/") and not next_url.startswith("//") else "/terminal"
             return RedirectResponse(url=redirect_to, status_code=302)
         else:
-            # Initialize list if key doesn't exist (defaultdict handles this, but being explicit)
-            if client_ip not in LOGIN_ATTEMPTS:
-                LOGIN_ATTEMPTS[client_ip] = []
-            LOGIN_ATTEMPTS[client_ip].append(now)
+            _record_failed_login(client_ip, now)
             # Логируем неудачную попытку входа
             log_failed_login(username, client_ip, reason="Invalid credentials")
             return templates.TemplateResponse(
                 "login.html",
-                {"request": request, "error": "Invalid credentials", "next_url": next_url, "csrf_token": get_csrf_token(request) or set_csrf_token(request)}
+                {"request": request, "error": "Invalid credentials", "next_url": next_url, "csrf_token": ensure_csrf_token(request)}
             )
     except Exception as e:
         log_error(e, "Login")
-        # Initialize list if key doesn't exist (defaultdict handles this, but being explicit)
-        if client_ip not in LOGIN_ATTEMPTS:
-            LOGIN_ATTEMPTS[client_ip] = []
-        LOGIN_ATTEMPTS[client_ip].append(now)
+        _record_failed_login(client_ip, now)
         return templates.TemplateResponse(
             "login.html",
-            {"request": request, "error": "Login failed", "next_url": next_url, "csrf_token": get_csrf_token(request) or set_csrf_token(request)}
+            {"request": request, "error": "Login failed", "next_url": next_url, "csrf_token": ensure_csrf_token(request)}
         )
 
 @app.get("/terminal", response_class=HTMLResponse)
-async def terminal_page(request: Request, db: Database = Depends(get_db)):
+async def terminal_page(request: Request):
     """Терминал с QR-кодом: доступен ролям terminal, admin, manager, hr"""
     if not request.session.get("authenticated"):
         return RedirectResponse(url="/login?next=/terminal", status_code=302)
     user_role = request.session.get("user_role")
-    if user_role not in ["terminal", "admin", "manager", "hr"]:
+    if user_role not in TERMINAL_ROLES:
         return RedirectResponse(url="/me", status_code=302)
-    context = build_terminal_context(request, db)
-    return templates.TemplateResponse("terminal.html", context)
+    return terminal_response()
 
 @app.get("/logout")
 async def logout(request: Request):
+    JWTHandler.forget_token(request.session.get("access_token"))
     request.session.clear()
     return RedirectResponse(url="/login", status_code=302)
 
@@ -605,11 +748,11 @@ async def admin_page(request: Request, db: Database = Depends(get_db)):
         return RedirectResponse(url="/login", status_code=302)
 
     user_role = request.session.get("user_role", "user")
-    if user_role not in ["admin", "manager", "hr"]:
+    if user_role not in ADMIN_ROLES:
         return RedirectResponse(url="/me", status_code=302)
 
     # Get currently present users; convert arrival time to local timezone for display
-    raw_present = db.get_currently_present()
+    raw_present = await run_in_threadpool(db.get_currently_present)
     present_users = []
     for u in raw_present:
         row = dict(u)
@@ -617,8 +760,8 @@ async def admin_page(request: Request, db: Database = Depends(get_db)):
         present_users.append(row)
 
     initial_creds = None
-    if user_role in ["admin", "manager", "hr"]:
-        initial_creds = db.consume_initial_credentials()
+    if user_role in ADMIN_ROLES:
+        initial_creds = await run_in_threadpool(db.consume_initial_credentials)
 
     return templates.TemplateResponse(
         "admin.html",
@@ -636,17 +779,17 @@ async def user_history(request: Request, user_id: int, db: Database = Depends(ge
         return RedirectResponse(url="/login", status_code=302)
 
     user_role = request.session.get("user_role", "user")
-    if user_role not in ["admin", "manager", "hr"]:
+    if user_role not in ADMIN_ROLES:
         return RedirectResponse(url="/me", status_code=302)
 
-    # Get user info
-    user = db.get_person_by_tg_id(user_id)
+    # Get user info and events concurrently (separate connections in the threadpool)
+    user, events = await asyncio.gather(
+        run_in_threadpool(db.get_person_by_tg_id, user_id),
+        run_in_threadpool(db.get_user_events, user_id, limit=100),
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # Get user events
-    events = db.get_user_events(user_id, limit=100)
-
     return templates.TemplateResponse(
         "user_history.html",
         {
@@ -658,19 +801,17 @@ async def user_history(request: Request, user_id: int, db: Database = Depends(ge
     )
 
 @app.get("/me", response_class=HTMLResponse)
-async def self_dashboard(request: Request, db: Database = Depends(get_db)):
+def self_dashboard(
+    request: Request,
+    db: Database = Depends(get_db),
+    payload: Optional[dict] = Depends(get_session_user),
+):
     """Personal dashboard for authenticated users (role user and above)"""
-    token = request.session.get("access_token")
-    if not token:
-        return RedirectResponse(url="/login", status_code=302)
+    if not payload:
+        # Нет токена, либо он невалидный или истек - редирект на логин
+        return login_redirect(request)
 
     try:
-        payload = JWTHandler.verify_token(token)
-        if not payload:
-            # Токен невалидный или истек - редирект на логин
-            request.session.clear()
-            return RedirectResponse(url="/login", status_code=302)
-        
         username = payload.get("sub")
         role = payload.get("role", "user")
 
@@ -714,98 +855,93 @@ async def self_dashboard(request: Request, db: Database = Depends(get_db)):
 
 # Analytics and user management pages
 @app.get("/analytics", response_class=HTMLResponse)
-async def analytics_dashboard(request: Request):
+async def analytics_dashboard(request: Request, payload: Optional[dict] = Depends(get_session_user)):
     """Analytics dashboard page"""
-    token = request.session.get("access_token")
-    if not token:
-        return RedirectResponse(url="/login", status_code=302)
-
-    try:
-        payload = JWTHandler.verify_token(token)
-        if not payload:
-            # Токен невалидный или истек - редирект на логин
-            request.session.clear()
-            return RedirectResponse(url="/login", status_code=302)
-        
-        user_role = payload.get("role", "user")
-
-        # Проверяем права доступа
-        if user_role not in ["admin", "manager", "hr"]:
-            return RedirectResponse(url="/terminal", status_code=302)
-
-        # Get analytics data
-        analytics_summary = db.get_analytics_summary()
-        daily_visits = db.get_daily_visits_chart()
-        hourly_distribution = db.get_hourly_distribution()
-        top_workers = db.get_top_workers()
-        department_stats = db.get_department_stats()
-
-        # Get employee list for selection
-        employee_list = db.get_employee_list()
-
-        return templates.TemplateResponse(
-            "analytics.html",
-            {
-                "request": request,
-                "analytics_summary": analytics_summary,
-                "daily_visits": daily_visits,
-                "hourly_distribution": hourly_distribution,
-                "top_workers": top_workers,
-                "department_stats": department_stats,
-                "employee_list": employee_list,
-                "active_nav": "analytics",
-            }
+    if not payload:
+        # Нет токена, либо он невалидный или истек - редирект на логин
+        return login_redirect(request)
+
+    user_role = payload.get("role", "user")
+
+    # Проверяем права доступа
+    if user_role not in ADMIN_ROLES:
+        return RedirectResponse(url="/terminal", status_code=302)
+
+    # Get analytics data and employee list for selection.
+    # Database opens a connection per call, so the queries run concurrently in the threadpool
+    (
+        analytics_summary,
+        daily_visits,
+        hourly_distribution,
+        top_workers,
+        department_stats,
+        employee_list,
+    ) = await asyncio.gather(*(
+        run_in_threadpool(query)
+        for query in (
+            db.get_analytics_summary,
+            db.get_daily_visits_chart,
+            db.get_hourly_distribution,
+            db.get_top_workers,
+            db.get_department_stats,
+            db.get_employee_list,
         )
-    except Exception as e:
-        log_error(e, "Analytics page token validation")
-        request.session.clear()
-        return RedirectResponse(url="/login", status_code=302)
+    ))
+
+    return templates.TemplateResponse(
+        "analytics.html",
+        {
+            "request": request,
+            "analytics_summary": analytics_summary,
+            "daily_visits": daily_visits,
+            "hourly_distribution": hourly_distribution,
+            "top_workers": top_workers,
+            "department_stats": department_stats,
+            "employee_list": employee_list,
+            "active_nav": "analytics",
+        }
+    )
 
 @app.get("/users", response_class=HTMLResponse)
-async def user_management(request: Request, db: Database = Depends(get_db)):
+async def user_management(
+    request: Request,
+    db: Database = Depends(get_db),
+    payload: Optional[dict] = Depends(get_session_user),
+):
     """User management page"""
-    token = request.session.get("access_token")
-    if not token:
-        return RedirectResponse(url="/login", status_code=302)
+    if not payload:
+        # Нет токена, либо он невалидный или истек - редирект на логин
+        return login_redirect(request)
 
-    # Генерируем CSRF токен для форм на странице
-    csrf_token = set_csrf_token(request)
+    # CSRF токен сессии для форм на странице (переиспользуем существующий)
+    csrf_token = ensure_csrf_token(request)
 
-    try:
-        payload = JWTHandler.verify_token(token)
-        if not payload:
-            # Токен невалидный или истек - редирект на логин
-            request.session.clear()
-            return RedirectResponse(url="/login", status_code=302)
-        
-        user_role = payload.get("role", "user")
+    user_role = payload.get("role", "user")
 
-        # Проверяем права доступа (только админ и менеджер)
-        if user_role not in ["admin", "manager"]:
-            client_ip = request.client.host if request.client else "unknown"
-            username = payload.get("sub")
-            log_unauthorized_access("/users", user=username, ip_address=client_ip, reason=f"Role '{user_role}' not allowed")
-            return RedirectResponse(url="/terminal", status_code=302)
+    # Проверяем права доступа (только админ и менеджер)
+    if user_role not in USER_MGMT_ROLES:
+        client_ip = get_client_ip(request)
+        username = payload.get("sub")
+        log_unauthorized_access("/users", user=username, ip_address=client_ip, reason=f"Role '{user_role}' not allowed")
+        return RedirectResponse(url="/terminal", status_code=302)
 
-        # Получаем данные для шаблона
-        users = db.get_all_web_users()
-        roles = db.get_all_roles()
+    # Получаем данные для шаблона
+    users, roles = await asyncio.gather(
+        run_in_threadpool(db.get_all_web_users),
+        run_in_threadpool(db.get_all_roles),
+    )
 
-        return templates.TemplateResponse(
-            "user_management.html",
-            {
-                "request": request,
-                "users": users,
-                "roles": roles,
-                "current_user_role": user_role,
-                "csrf_token": csrf_token,
-                "active_nav": "users",
-            }
-        )
-    except Exception as e:
-        log_error(e, "User management page")
-        request.session.clear()
-        return RedirectResponse(url="/login", status_code=302)
+    return templates.TemplateResponse(
+        "user_management.html",
+        {
+            "request": request,
+            "users": users,
+            "roles": roles,
+            "current_user_role": user_role,
+            "csrf_token": csrf_token,
+            "active_nav": "users",
+        }
+    )
 
 # API endpoints for user management
 @app.get(
@@ -834,18 +970,16 @@ async def user_management(request: Request, db: Database = Depends(get_db)):
     ```
     """
 )
-async def get_user(request: Request, user_id: int, db: Database = Depends(get_db)):
+def get_user(request: Request, user_id: int, db: Database = Depends(get_db)):
     """Get user by ID"""
     rate_limit(request, max_requests=20, window_seconds=60, key_prefix="user_mgmt")
-    authorize_request(request, require_roles=["admin", "manager"])
+    authorize_request(request, require_roles=USER_MGMT_ROLES)
     
     user = db.get_web_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Remove password hash from response
-    user.pop('password_hash', None)
-    return user
+    return user_response(user)
 
 @app.put(
     "/api/user/{user_id}",
@@ -906,7 +1040,7 @@ async def update_user(
     # Parse JSON body first to get CSRF token
     form_token = None
     try:
-        body = await request.json()
+        body = orjson.loads(await request.body())
         # For JSON requests, CSRF token should be in header
     except Exception:
         # Fallback to form data
@@ -918,15 +1052,15 @@ async def update_user(
     # Проверка CSRF токена (передаем токен из формы, если есть)
     await require_csrf_token(request, form_token=form_token)
     # Authorize and get payload once
-    payload = authorize_request(request, require_roles=["admin", "manager"])
+    payload = authorize_request(request, require_roles=USER_MGMT_ROLES)
     
     # Get current user ID for audit
     current_username = payload.get("sub")
-    current_user = db.get_web_user_by_username(current_username) if current_username else None
+    current_user = await run_in_threadpool(db.get_web_user_by_username, current_username) if current_username else None
     updated_by = current_user.get("id") if current_user else None
     
     # Check if user exists
-    user = db.get_web_user_by_id(user_id)
+    user = await run_in_threadpool(db.get_web_user_by_id, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -934,7 +1068,7 @@ async def update_user(
     if 'is_active' in body:
         val = body['is_active']
         if isinstance(val, str):
-            body['is_active'] = val.lower() in ('true', '1', 'yes', 'on')
+            body['is_active'] = val.lower() in TRUTHY_STRINGS
     
     # Extract fields (only update provided fields)
     full_name = body.get('full_name')
@@ -958,7 +1092,7 @@ async def update_user(
         # Логируем изменение роли
         old_role = user.get("role")
         if old_role != role:
-            client_ip = request.client.host if request.client else "unknown"
+            client_ip = get_client_ip(request)
             log_role_change(current_username or "unknown", user.get("username", f"user_{user_id}"), old_role, role, client_ip)
     
     if department is not None:
@@ -981,8 +1115,9 @@ async def update_user(
         if not is_valid:
             raise HTTPException(status_code=400, detail=f"Ошибка валидации пароля: {error_msg}")
     
-    # Update user
-    success = db.update_web_user(
+    # Update user (password hashing is CPU-bound — keep it off the event loop)
+    updated_user = await run_in_threadpool(
+        db.update_web_user,
         user_id=user_id,
         full_name=full_name,
         role=role,
@@ -993,13 +1128,10 @@ async def update_user(
         updated_by=updated_by
     )
     
-    if not success:
+    if not updated_user:
         raise HTTPException(status_code=400, detail="Failed to update user")
     
-    # Return updated user
-    updated_user = db.get_web_user_by_id(user_id)
-    updated_user.pop('password_hash', None)
-    return updated_user
+    return user_response(updated_user)
 
 @app.get(
     "/api/employee/{employee_id}",
@@ -1028,29 +1160,43 @@ async def update_user(
     ```
     """
 )
-async def get_employee_stats(request: Request, employee_id: int, db: Database = Depends(get_db)):
+def get_employee_stats(request: Request, employee_id: int, db: Database = Depends(get_db)):
     """Get detailed statistics for a specific employee"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_analytics")
-    authorize_request(request, require_roles=["admin", "manager", "hr"])
-    stats = db.get_employee_detailed_stats(employee_id)
+    authorize_request(request, require_roles=ADMIN_ROLES)
+    stats = ANALYTICS_FLIGHT.do(("employee", employee_id), db.get_employee_detailed_stats, employee_id)
     if not stats:
         raise HTTPException(status_code=404, detail="Employee not found")
 
     return stats
 
+_ISO_DATE_RE = re.compile(r"\A\d{4}-\d{2}-\d{2}\Z")
+
+@lru_cache(maxsize=2048)
+def _is_iso_date(value: str) -> bool:
+    """YYYY-MM-DD calendar date (memoized: dashboards request the same dates over and over)"""
+    if not _ISO_DATE_RE.match(value):
+        return False
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+def require_iso_dates(*values: str) -> None:
+    """400 unless every value is a YYYY-MM-DD date"""
+    if not all(len(value) == 10 and _is_iso_date(value) for value in values):
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+
 @app.get("/api/employees/date/{date}")
-async def get_employees_by_date(request: Request, date: str, db: Database = Depends(get_db)):
+def get_employees_by_date(request: Request, date: str, db: Database = Depends(get_db)):
     """Get list of employees who visited on a specific date (YYYY-MM-DD)"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_analytics")
-    authorize_request(request, require_roles=["admin", "manager", "hr"])
+    authorize_request(request, require_roles=ADMIN_ROLES)
     
-    try:
-        # Validate date format
-        datetime.strptime(date, "%Y-%m-%d")
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    require_iso_dates(date)
     
-    employees = db.get_employees_by_date(date)
+    employees = ANALYTICS_FLIGHT.do(("employees", date), db.get_employees_by_date, date)
     return {
         "date": date,
         "employees": employees,
@@ -1086,12 +1232,19 @@ async def get_employees_by_date(request: Request, date: str, db: Database = Depe
     ```
     """
 )
-async def analytics_daily(request: Request, date: str, db: Database = Depends(get_db)):
+def analytics_daily(request: Request, date: str, db: Database = Depends(get_db)):
     """Daily analytics by date (YYYY-MM-DD)"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_analytics")
-    authorize_request(request, require_roles=["admin", "manager", "hr"])
-    stats = db.get_daily_stats(date)
-    return {"date": date, **stats}
+    authorize_request(request, require_roles=ADMIN_ROLES)
+    require_iso_dates(date)
+    stats = ANALYTICS_FLIGHT.do(("daily", date), db.get_daily_stats, date)
+    return AnalyticsJSONResponse({"date": date, **stats})
+
+@lru_cache(maxsize=1)
+def _weekly_range(day_ordinal: int) -> tuple[str, str]:
+    """ISO (start, end) of the 7 days ending on the given UTC day; recomputed once per day"""
+    today = date.fromordinal(day_ordinal)
+    return (today - timedelta(days=6)).isoformat(), today.isoformat()
 
 @app.get(
     "/api/analytics/weekly",
@@ -1112,19 +1265,17 @@ async def analytics_daily(request: Request, date: str, db: Database = Depends(ge
     - Rate Limit: 30 запросов/минуту
     """
 )
-async def analytics_weekly(request: Request, db: Database = Depends(get_db)):
+def analytics_weekly(request: Request, db: Database = Depends(get_db)):
     """Weekly analytics for last 7 days"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_analytics")
-    authorize_request(request, require_roles=["admin", "manager", "hr"])
-    today = datetime.utcnow().date()
-    start_date = (today - timedelta(days=6)).isoformat()
-    end_date = today.isoformat()
-    data = db.get_weekly_stats(start_date, end_date)
-    return {
+    authorize_request(request, require_roles=ADMIN_ROLES)
+    start_date, end_date = _weekly_range(datetime.now(timezone.utc).date().toordinal())
+    data = ANALYTICS_FLIGHT.do(("weekly", start_date), db.get_weekly_stats, start_date, end_date)
+    return AnalyticsJSONResponse({
         "period": {"start": start_date, "end": end_date},
         "data": data,
         "daily_stats": data
-    }
+    })
 
 @app.get(
     "/api/analytics/locations",
@@ -1145,12 +1296,12 @@ async def analytics_weekly(request: Request, db: Database = Depends(get_db)):
     - Rate Limit: 30 запросов/минуту
     """
 )
-async def analytics_locations(request: Request, db: Database = Depends(get_db)):
+def analytics_locations(request: Request, db: Database = Depends(get_db)):
     """Analytics by locations (global in current implementation)"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_analytics")
-    authorize_request(request, require_roles=["admin", "manager", "hr"])
-    data = db.get_location_stats()
-    return {"locations": data}
+    authorize_request(request, require_roles=ADMIN_ROLES)
+    data = ANALYTICS_FLIGHT.do(("locations",), db.get_location_stats)
+    return AnalyticsJSONResponse({"locations": data})
 
 @app.get(
     "/api/analytics/users",
@@ -1180,12 +1331,14 @@ async def analytics_locations(request: Request, db: Database = Depends(get_db)):
     ```
     """
 )
-async def analytics_users(request: Request, limit: int = 10, db: Database = Depends(get_db)):
+def analytics_users(request: Request, limit: int = 10, db: Database = Depends(get_db)):
     """Most active users"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_analytics")
-    authorize_request(request, require_roles=["admin", "manager", "hr"])
-    data = db.get_user_stats(limit)
-    return {"users": data}
+    authorize_request(request, require_roles=ADMIN_ROLES)
+    # Ограничиваем limit: размер сортировки/ответа и число ключей кэша (analytics:user:{limit})
+    limit = max(1, min(limit, ANALYTICS_USERS_MAX_LIMIT))
+    data = ANALYTICS_FLIGHT.do(("users", limit), db.get_user_stats, limit)
+    return AnalyticsJSONResponse({"users": data})
 
 @app.get(
     "/api/analytics/hourly/{date}",
@@ -1216,12 +1369,13 @@ async def analytics_users(request: Request, limit: int = 10, db: Database = Depe
     ```
     """
 )
-async def analytics_hourly(request: Request, date: str, db: Database = Depends(get_db)):
+def analytics_hourly(request: Request, date: str, db: Database = Depends(get_db)):
     """Hourly analytics for a date (YYYY-MM-DD)"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_analytics")
-    authorize_request(request, require_roles=["admin", "manager", "hr"])
-    data = db.get_hourly_stats(date)
-    return {"date": date, "hourly": data, "hourly_stats": data}
+    authorize_request(request, require_roles=ADMIN_ROLES)
+    require_iso_dates(date)
+    data = ANALYTICS_FLIGHT.do(("hourly", date), db.get_hourly_stats, date)
+    return AnalyticsJSONResponse({"date": date, "hourly": data, "hourly_stats": data})
 
 @app.get(
     "/api/health",
@@ -1252,60 +1406,60 @@ async def analytics_hourly(request: Request, date: str, db: Database = Depends(g
 )
 async def health_check(db: Database = Depends(get_db)):
     """Enhanced health check endpoint with detailed system information"""
-    from utils.metrics import get_system_metrics, get_redis_metrics, get_database_metrics
     
     health_status = {
         "status": "healthy",
         "version": "1.0.0",
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": iso_now(),
         "checks": {}
     }
     
     overall_healthy = True
     
+    # Независимые проверки выполняются параллельно в threadpool: время ответа = самая медленная проверка
+    db_metrics, redis_metrics, system_metrics = await asyncio.gather(
+        run_in_threadpool(get_database_metrics, db),
+        run_in_threadpool(get_redis_metrics),
+        run_in_threadpool(get_system_metrics),
+        return_exceptions=True,
+    )
+    
     # Database check
-    try:
-        db_metrics = get_database_metrics(db)
+    if isinstance(db_metrics, Exception):
+        health_status["checks"]["database"] = {"status": "error", "error": str(db_metrics)}
+        overall_healthy = False
+    else:
         health_status["checks"]["database"] = db_metrics
         if db_metrics.get("status") != "healthy":
             overall_healthy = False
-    except Exception as e:
-        health_status["checks"]["database"] = {"status": "error", "error": str(e)}
-        overall_healthy = False
     
     # Redis check
-    try:
-        redis_metrics = get_redis_metrics()
+    if isinstance(redis_metrics, Exception):
+        health_status["checks"]["redis"] = {"status": "error", "error": str(redis_metrics)}
+        if REDIS_ENABLED and cache.redis_client:
+            overall_healthy = False
+    else:
         health_status["checks"]["redis"] = redis_metrics
-        from config.config import REDIS_ENABLED
         if REDIS_ENABLED and cache.redis_client and not redis_metrics.get("connected"):
             overall_healthy = False
-    except Exception as e:
-        health_status["checks"]["redis"] = {"status": "error", "error": str(e)}
-        from config.config import REDIS_ENABLED
-        if REDIS_ENABLED and cache.redis_client:
-            overall_healthy = False
     
     # System metrics (optional, don't fail if unavailable)
-    try:
-        system_metrics = get_system_metrics()
-        if "error" not in system_metrics:
-            health_status["system"] = system_metrics
-    except:
-        pass  # System metrics are optional
+    if not isinstance(system_metrics, Exception) and "error" not in system_metrics:
+        health_status["system"] = system_metrics
     
     if not overall_healthy:
         health_status["status"] = "degraded"
     
     status_code = 200 if overall_healthy else 503
-    return Response(
-        content=json.dumps(health_status, indent=2),
-        media_type="application/json",
-        status_code=status_code
+    return ORJSONResponse(
+        health_status,
+        status_code=status_code,
+        # Короткий кэш гасит частые опросы мониторинга; сбой не кэшируем
+        headers={"Cache-Control": "public, max-age=5" if overall_healthy else "no-store"},
     )
 
 @app.get("/api/analytics/compare")
-async def analytics_compare(
+def analytics_compare(
     request: Request,
     period1_start: str,
     period1_end: str,
@@ -1315,20 +1469,14 @@ async def analytics_compare(
 ):
     """Сравнить два периода по метрикам"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_analytics")
-    authorize_request(request, require_roles=["admin", "manager", "hr"])
+    authorize_request(request, require_roles=ADMIN_ROLES)
     
-    try:
-        datetime.strptime(period1_start, "%Y-%m-%d")
-        datetime.strptime(period1_end, "%Y-%m-%d")
-        datetime.strptime(period2_start, "%Y-%m-%d")
-        datetime.strptime(period2_end, "%Y-%m-%d")
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    require_iso_dates(period1_start, period1_end, period2_start, period2_end)
     
-    return db.compare_periods(period1_start, period1_end, period2_start, period2_end)
+    return AnalyticsJSONResponse(db.compare_periods(period1_start, period1_end, period2_start, period2_end))
 
 @app.get("/api/analytics/late-arrivals")
-async def analytics_late_arrivals(
+def analytics_late_arrivals(
     request: Request,
     start_date: str,
     end_date: str,
@@ -1337,18 +1485,14 @@ async def analytics_late_arrivals(
 ):
     """Получить статистику опозданий"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_analytics")
-    authorize_request(request, require_roles=["admin", "manager", "hr"])
+    authorize_request(request, require_roles=ADMIN_ROLES)
     
-    try:
-        datetime.strptime(start_date, "%Y-%m-%d")
-        datetime.strptime(end_date, "%Y-%m-%d")
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    require_iso_dates(start_date, end_date)
     
-    return db.get_late_arrivals_stats(start_date, end_date, late_threshold_hours)
+    return AnalyticsJSONResponse(db.get_late_arrivals_stats(start_date, end_date, late_threshold_hours))
 
 @app.get("/api/analytics/overtime")
-async def analytics_overtime(
+def analytics_overtime(
     request: Request,
     start_date: str,
     end_date: str,
@@ -1357,18 +1501,14 @@ async def analytics_overtime(
 ):
     """Получить отчет по переработкам"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_analytics")
-    authorize_request(request, require_roles=["admin", "manager", "hr"])
+    authorize_request(request, require_roles=ADMIN_ROLES)
     
-    try:
-        datetime.strptime(start_date, "%Y-%m-%d")
-        datetime.strptime(end_date, "%Y-%m-%d")
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    require_iso_dates(start_date, end_date)
     
-    return db.get_overtime_report(start_date, end_date, standard_hours_per_day)
+    return AnalyticsJSONResponse(db.get_overtime_report(start_date, end_date, standard_hours_per_day))
 
 @app.get("/api/analytics/weekly-distribution")
-async def analytics_weekly_distribution(
+def analytics_weekly_distribution(
     request: Request,
     start_date: str,
     end_date: str,
@@ -1376,18 +1516,14 @@ async def analytics_weekly_distribution(
 ):
     """Получить распределение рабочего времени по дням недели"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_analytics")
-    authorize_request(request, require_roles=["admin", "manager", "hr"])
+    authorize_request(request, require_roles=ADMIN_ROLES)
     
-    try:
-        datetime.strptime(start_date, "%Y-%m-%d")
-        datetime.strptime(end_date, "%Y-%m-%d")
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    require_iso_dates(start_date, end_date)
     
-    return db.get_weekly_distribution(start_date, end_date)
+    return AnalyticsJSONResponse(db.get_weekly_distribution(start_date, end_date))
 
 @app.get("/api/analytics/calendar/{year}/{month}")
-async def analytics_calendar(
+def analytics_calendar(
     request: Request,
     year: int,
     month: int,
@@ -1395,7 +1531,7 @@ async def analytics_calendar(
 ):
     """Получить данные календаря для конкретного месяца"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_analytics")
-    authorize_request(request, require_roles=["admin", "manager", "hr"])
+    authorize_request(request, require_roles=ADMIN_ROLES)
     
     if month < 1 or month > 12:
         raise HTTPException(status_code=400, detail="Invalid month. Must be 1-12")
@@ -1514,10 +1650,10 @@ async def analytics_calendar(
             })
             current_date += timedelta(days=1)
         
-        return {'days': result}
+        return AnalyticsJSONResponse({'days': result})
 
 @app.get("/api/audit-log")
-async def get_audit_log(
+def get_audit_log(
     request: Request,
     limit: int = 100,
     offset: int = 0,
@@ -1529,12 +1665,12 @@ async def get_audit_log(
 ):
     """Получить записи журнала аудита"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_audit")
-    authorize_request(request, require_roles=["admin"])
+    authorize_request(request, require_roles=SUPERADMIN_ROLES)
     
     return db.get_audit_log(limit, offset, action_type, user_id, start_date, end_date)
 
 @app.get("/api/vacations")
-async def get_vacations(
+def get_vacations(
     request: Request,
     user_id: int = None,
     status: str = None,
@@ -1544,7 +1680,7 @@ async def get_vacations(
 ):
     """Получить список отпусков"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_vacations")
-    authorize_request(request, require_roles=["admin", "manager", "hr"])
+    authorize_request(request, require_roles=ADMIN_ROLES)
     
     return db.get_vacations(user_id, status, start_date, end_date)
 
@@ -1561,28 +1697,29 @@ async def create_vacation(
     """Создать запись об отпуске"""
     rate_limit(request, max_requests=10, window_seconds=60, key_prefix="api_vacations")
     await require_csrf_token(request)
-    payload = authorize_request(request, require_roles=["admin", "manager", "hr"])
+    payload = authorize_request(request, require_roles=ADMIN_ROLES)
     
-    current_user = db.get_web_user_by_username(payload.get("sub"))
+    current_user = await run_in_threadpool(db.get_web_user_by_username, payload.get("sub"))
     created_by = current_user.get("id") if current_user else None
     
-    vacation_id = db.create_vacation(user_id, start_date, end_date, vacation_type, created_by, notes)
+    vacation_id = await run_in_threadpool(db.create_vacation, user_id, start_date, end_date, vacation_type, created_by, notes)
     
     # Логируем действие
-    db.add_audit_log_entry(
+    await run_in_threadpool(
+        db.add_audit_log_entry,
         "vacation_created",
         user_id=created_by,
         username=payload.get("sub"),
         target_type="vacation",
         target_id=vacation_id,
-        ip_address=request.client.host if request.client else None,
+        ip_address=get_client_ip(request),
         user_agent=request.headers.get("user-agent")
     )
     
     return {"id": vacation_id, "status": "created"}
 
 @app.get("/api/sick-leaves")
-async def get_sick_leaves(
+def get_sick_leaves(
     request: Request,
     user_id: int = None,
     status: str = None,
@@ -1592,7 +1729,7 @@ async def get_sick_leaves(
 ):
     """Получить список больничных"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_sick_leaves")
-    authorize_request(request, require_roles=["admin", "manager", "hr"])
+    authorize_request(request, require_roles=ADMIN_ROLES)
     
     return db.get_sick_leaves(user_id, status, start_date, end_date)
 
@@ -1608,35 +1745,36 @@ async def create_sick_leave(
     """Создать запись о больничном"""
     rate_limit(request, max_requests=10, window_seconds=60, key_prefix="api_sick_leaves")
     await require_csrf_token(request)
-    payload = authorize_request(request, require_roles=["admin", "manager", "hr"])
+    payload = authorize_request(request, require_roles=ADMIN_ROLES)
     
-    current_user = db.get_web_user_by_username(payload.get("sub"))
+    current_user = await run_in_threadpool(db.get_web_user_by_username, payload.get("sub"))
     created_by = current_user.get("id") if current_user else None
     
-    sick_leave_id = db.create_sick_leave(user_id, start_date, end_date, created_by, notes)
+    sick_leave_id = await run_in_threadpool(db.create_sick_leave, user_id, start_date, end_date, created_by, notes)
     
     # Логируем действие
-    db.add_audit_log_entry(
+    await run_in_threadpool(
+        db.add_audit_log_entry,
         "sick_leave_created",
         user_id=created_by,
         username=payload.get("sub"),
         target_type="sick_leave",
         target_id=sick_leave_id,
-        ip_address=request.client.host if request.client else None,
+        ip_address=get_client_ip(request),
         user_agent=request.headers.get("user-agent")
     )
     
     return {"id": sick_leave_id, "status": "created"}
 
 @app.get("/api/report-templates")
-async def get_report_templates(
+def get_report_templates(
     request: Request,
     template_type: str = None,
     db: Database = Depends(get_db)
 ):
     """Получить список шаблонов отчетов"""
     rate_limit(request, max_requests=30, window_seconds=60, key_prefix="api_templates")
-    authorize_request(request, require_roles=["admin", "manager", "hr"])
+    authorize_request(request, require_roles=ADMIN_ROLES)
     
     return db.get_report_templates(template_type)
 
@@ -1652,12 +1790,12 @@ async def create_report_template(
     """Создать шаблон отчета"""
     rate_limit(request, max_requests=10, window_seconds=60, key_prefix="api_templates")
     await require_csrf_token(request)
-    payload = authorize_request(request, require_roles=["admin", "manager"])
+    payload = authorize_request(request, require_roles=USER_MGMT_ROLES)
     
-    current_user = db.get_web_user_by_username(payload.get("sub"))
+    current_user = await run_in_threadpool(db.get_web_user_by_username, payload.get("sub"))
     created_by = current_user.get("id") if current_user else None
     
-    template_id = db.create_report_template(name, template_type, config, created_by, description)
+    template_id = await run_in_threadpool(db.create_report_template, name, template_type, config, created_by, description)
     
     return {"id": template_id, "status": "created"}
 
@@ -1670,16 +1808,16 @@ async def delete_report_template(
     """Удалить шаблон отчета"""
     rate_limit(request, max_requests=10, window_seconds=60, key_prefix="api_templates")
     await require_csrf_token(request)
-    payload = authorize_request(request, require_roles=["admin"])
+    payload = authorize_request(request, require_roles=SUPERADMIN_ROLES)
     
-    success = db.delete_report_template(template_id)
+    success = await run_in_threadpool(db.delete_report_template, template_id)
     if not success:
         raise HTTPException(status_code=404, detail="Template not found")
     
     return {"status": "deleted"}
 
 @app.post("/api/export/send-email")
-async def send_report_email(
+def send_report_email(
     request: Request,
     to_email: str,
     report_type: str,
@@ -1691,7 +1829,7 @@ async def send_report_email(
 ):
     """Отправить отчет по email"""
     rate_limit(request, max_requests=5, window_seconds=60, key_prefix="export_email")
-    payload = authorize_request(request, require_roles=["admin", "manager", "hr"])
+    payload = authorize_request(request, require_roles=ADMIN_ROLES)
     
     from utils.email_sender import email_sender
     from email_validator import validate_email, EmailNotValidError
@@ -1754,7 +1892,7 @@ async def send_report_email(
             raise HTTPException(status_code=500, detail="Failed to send email")
 
 @app.get("/api/export/ical")
-async def export_ical(
+def export_ical(
     request: Request,
     user_id: int = None,
     start_date: str = None,
@@ -1763,7 +1901,7 @@ async def export_ical(
 ):
     """Экспорт событий в формат iCal (.ics)"""
     rate_limit(request, max_requests=10, window_seconds=60, key_prefix="export_ical")
-    payload = authorize_request(request, require_roles=["admin", "manager", "hr", "user"])
+    payload = authorize_request(request, require_roles=STAFF_ROLES)
     
     from icalendar import Calendar, Event
     from datetime import datetime as dt
@@ -1867,23 +2005,31 @@ async def export_ical(
 )
 async def get_metrics(db: Database = Depends(get_db)):
     """Get detailed performance metrics (for monitoring systems)"""
-    from utils.metrics import get_system_metrics, get_redis_metrics, get_database_metrics
+    
+    timestamp = iso_now()
+    database, redis_metrics, system, health_stats = await asyncio.gather(
+        run_in_threadpool(get_database_metrics, db),
+        run_in_threadpool(get_redis_metrics),
+        run_in_threadpool(get_system_metrics),
+        run_in_threadpool(db.get_system_health_stats),
+        return_exceptions=True,
+    )
+    for result in (database, redis_metrics, system):
+        if isinstance(result, Exception):
+            raise result
     
     metrics = {
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-        "database": get_database_metrics(db),
-        "redis": get_redis_metrics(),
-        "system": get_system_metrics()
+        "timestamp": timestamp,
+        "database": database,
+        "redis": redis_metrics,
+        "system": system,
     }
-    
-    # Add system health stats if available
-    try:
-        health_stats = db.get_system_health_stats()
+    # Add system health stats if available (key omitted otherwise)
+    if not isinstance(health_stats, Exception) and health_stats is not None:
         metrics["application"] = health_stats
-    except:
-        pass
     
-    return metrics
+    # Собранный локально dict: отдаём напрямую, без повторной валидации через MetricsResponse
+    return ORJSONResponse(metrics)
 
 def format_hours_to_hhmm_util(hours: float) -> str:
     """Утилита для форматирования часов в ЧЧ:ММ (использует time_formatter, "-" для нуля/отрицательных)."""
@@ -1892,7 +2038,7 @@ def format_hours_to_hhmm_util(hours: float) -> str:
     return format_hours_to_hhmm(hours)
 
 @app.get("/api/export/pivot")
-async def export_pivot_report(
+def export_pivot_report(
     request: Request,
     start_date: str = None,
     end_date: str = None,
@@ -1911,7 +2057,7 @@ async def export_pivot_report(
     - format: "csv", "xlsx" или "md"
     """
     rate_limit(request, max_requests=10, window_seconds=60, key_prefix="export")
-    payload = authorize_request(request, require_roles=["admin", "manager", "hr"])
+    payload = authorize_request(request, require_roles=ADMIN_ROLES)
     
     # Логируем экспорт
     username = payload.get("sub", "unknown")
@@ -1947,4 +2093,13 @@ from backend.routes.misc import router as misc_router
 app.include_router(misc_router)
 
 if __name__ == "__main__":
-    uvicorn.run(app, host=API_HOST, port=API_PORT)
+    # uvloop + httptools come with uvicorn[standard]; uvloop is not available on Windows
+    uvicorn.run(
+        "backend.main:app" if API_WORKERS > 1 else app,
+        host=API_HOST,
+        port=API_PORT,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        workers=API_WORKERS,
+        access_log=API_ACCESS_LOG,
+    )
@@ -4,12 +4,16 @@ from fastapi.responses import PlainTextResponse, Response
 
 router = APIRouter(tags=["misc"])
 
+# Ответы константные — отдаём их прокси/браузеру на сутки
+STATIC_CACHE_HEADERS = {"Cache-Control": "public, max-age=86400, immutable"}
+ROBOTS_TXT = b"User-agent: *\nDisallow: /\n"
+
 
 @router.get("/robots.txt", response_class=PlainTextResponse)
 async def robots():
-    return "User-agent: *\nDisallow: /\n"
+    return PlainTextResponse(ROBOTS_TXT, headers=STATIC_CACHE_HEADERS)
 
 
 @router.get("/favicon.ico")
 async def favicon():
-    return Response(status_code=204)
+    return Response(status_code=204, headers=STATIC_CACHE_HEADERS)
@@ -25,6 +25,14 @@ BASE_DIR = Path(__file__).parent.parent
 
 # Database settings
 DB_PATH = Path(os.getenv("DB_PATH", BASE_DIR / "attendance.db"))
+# SQLite journal mode: WAL lets web readers run while the bot writes (needs a local filesystem)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+# Memory-mapped I/O per connection (bytes); pages are shared via the OS cache across short-lived connections
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Analytics read per-day/per-hour summary tables (kept in sync by triggers) instead of scanning events
+ANALYTICS_AGGREGATES = os.getenv("ANALYTICS_AGGREGATES", "true").lower() == "true"
+# Max analytics queries running against the DB at once (the rest wait for a slot)
+ANALYTICS_DB_CONCURRENCY = int(os.getenv("ANALYTICS_DB_CONCURRENCY", "20"))
 
 # Telegram Bot settings (must be provided via env)
 BOT_TOKEN = _require_env("BOT_TOKEN")
@@ -40,6 +48,16 @@ WEB_PASSWORD = _require_env("WEB_PASSWORD")
 # API settings
 API_HOST = "0.0.0.0"
 API_PORT = 8000
+# Uvicorn worker processes; keep 1 unless REDIS_ENABLED (login limiter and caches fall back to process memory)
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+# Uvicorn access log (one synchronous write per request); app-level logging covers auth/errors
+API_ACCESS_LOG = os.getenv("API_ACCESS_LOG", "false").lower() == "true"
+# pyinstrument profiling of requests with ?profile=1 (needs requirements-dev.txt; never enable in production)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+# Re-read changed templates from disk (stat on every render); enable only while editing templates
+TEMPLATES_AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD", "false").lower() == "true"
+# Worker threads for blocking calls (password hashing, SQLite); anyio default is 40
+API_THREADPOOL_SIZE = int(os.getenv("API_THREADPOOL_SIZE", "100"))
 
 # QR update interval (seconds)
 QR_UPDATE_INTERVAL = 5
@@ -53,6 +71,12 @@ JWT_SECRET_KEY_PREV = os.getenv("JWT_SECRET_KEY_PREV")
 JWT_SECRET_KEYS = [k for k in [JWT_SECRET_KEY, JWT_SECRET_KEY_PREV] if k]
 JWT_ALGORITHM = "HS256"
 JWT_ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+# Argon2id password hashing parameters (tune so one hash takes ~100ms on the target host)
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "2"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "2"))
+# How long a verified token payload is reused without re-checking the signature (seconds)
+JWT_VERIFY_CACHE_TTL = int(os.getenv("JWT_VERIFY_CACHE_TTL", "30"))
 
 # User roles and permissions
 USER_ROLES = {
@@ -108,6 +132,7 @@ LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_TO_FILE = os.getenv("LOG_TO_FILE", "true").lower() == "true"
 LOG_MAX_SIZE = int(os.getenv("LOG_MAX_SIZE", "10485760"))  # 10MB default
 LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE = os.getenv("LOG_QUEUE", "true").lower() == "true"  # write logs from a background thread
 
 # Redis settings
 REDIS_ENABLED = os.getenv("REDIS_ENABLED", "true").lower() == "true"
@@ -120,7 +145,9 @@ REDIS_URL = f"redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}" if
 # Cache TTL settings (in seconds)
 CACHE_TTL_TOKEN = int(os.getenv("CACHE_TTL_TOKEN", "300"))  # 5 minutes for tokens
 CACHE_TTL_ANALYTICS = int(os.getenv("CACHE_TTL_ANALYTICS", "600"))  # 10 minutes for analytics
+CACHE_TTL_ANALYTICS_CLOSED_DAY = int(os.getenv("CACHE_TTL_ANALYTICS_CLOSED_DAY", "604800"))  # 7 days for past dates (events are never back-dated)
 CACHE_TTL_USER = int(os.getenv("CACHE_TTL_USER", "1800"))  # 30 minutes for user data
+CACHE_TTL_ACTIVE_TOKEN = int(os.getenv("CACHE_TTL_ACTIVE_TOKEN", str(QR_UPDATE_INTERVAL)))  # one QR refresh cycle
 
 # Timezone settings
 def get_timezone():
@@ -5,21 +5,29 @@ from contextlib import contextmanager
 import secrets
 from utils.cache import (
     get_cached_token, set_cached_token, invalidate_token,
+    get_cached_active_token, set_cached_active_token, invalidate_active_token,
+    get_cached_user, set_cached_user, invalidate_user,
     get_cached_analytics_daily, set_cached_analytics_daily,
     get_cached_analytics_weekly, set_cached_analytics_weekly,
     get_cached_analytics_location, set_cached_analytics_location,
     get_cached_analytics_users, set_cached_analytics_users,
     get_cached_analytics_hourly, set_cached_analytics_hourly,
+    get_cached_employees_by_date, set_cached_employees_by_date, invalidate_analytics_day,
     get_cached_system_health, set_cached_system_health,
     cache
 )
-from config.config import CACHE_TTL_USER, CACHE_TTL_ANALYTICS, TIMEZONE_OFFSET_HOURS
+from config.config import (
+    CACHE_TTL_USER, CACHE_TTL_ANALYTICS, TIMEZONE_OFFSET_HOURS, SQLITE_JOURNAL_MODE, SQLITE_MMAP_SIZE,
+    ANALYTICS_AGGREGATES
+)
 
 # SQLite timezone offset modifier built from config (e.g. "+3 hours" or "-5 hours")
 _hours = abs(TIMEZONE_OFFSET_HOURS)
 _sign = "+" if TIMEZONE_OFFSET_HOURS >= 0 else "-"
 _TZ_SQL_OFFSET = f"{_sign}{_hours} hours"
 
+_WAL = SQLITE_JOURNAL_MODE.upper() == "WAL"
+
 class Database:
     def __init__(self, db_path: str = "attendance.db"):
         self.db_path = db_path
@@ -31,6 +39,12 @@ class Database:
         conn = sqlite3.connect(self.db_path, timeout=10)
         conn.row_factory = sqlite3.Row
         conn.execute("PRAGMA foreign_keys = ON")
+        # Per-connection settings (connections are short-lived, so no large page cache)
+        if _WAL:
+            # WAL + NORMAL: no fsync per commit, still corruption-safe
+            conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
         try:
             yield conn
         finally:
@@ -41,6 +55,10 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
+            # Journal mode is stored in the database file: set once here
+            if SQLITE_JOURNAL_MODE:
+                cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+
             # People table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS people (
@@ -251,6 +269,9 @@ class Database:
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_sick_leaves_user_id ON sick_leaves (user_id)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_sick_leaves_dates ON sick_leaves (start_date, end_date)")
 
+            # Analytics summary tables
+            self._init_analytics_aggregates(cursor)
+
             # Create default roles
             from config.config import USER_ROLES
             import json
@@ -302,6 +323,68 @@ class Database:
 
             conn.commit()
 
+    def _init_analytics_aggregates(self, cursor):
+        """Create per-day/per-hour event summary tables and the trigger that maintains them
+
+        Events are only ever inserted, so an AFTER INSERT trigger keeps the summaries
+        exact for every writer (web app and bot). Per-user daily rows make
+        unique_users a row count. Tables are backfilled when the trigger is first created.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS event_daily_user_stats (
+                date      TEXT NOT NULL,
+                user_id   INTEGER NOT NULL,
+                checkins  INTEGER NOT NULL DEFAULT 0,
+                checkouts INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (date, user_id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS event_hourly_stats (
+                date      TEXT NOT NULL,
+                hour      TEXT NOT NULL,
+                checkins  INTEGER NOT NULL DEFAULT 0,
+                checkouts INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (date, hour)
+            ) WITHOUT ROWID
+        ''')
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_events_stats'")
+        if cursor.fetchone():
+            return
+
+        # ts is an ISO UTC timestamp: date = first 10 chars, hour = chars 12-13
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_events_stats AFTER INSERT ON events
+            BEGIN
+                INSERT INTO event_daily_user_stats (date, user_id, checkins, checkouts)
+                VALUES (substr(NEW.ts, 1, 10), NEW.user_id, NEW.action = 'in', NEW.action = 'out')
+                ON CONFLICT (date, user_id) DO UPDATE SET
+                    checkins = checkins + excluded.checkins,
+                    checkouts = checkouts + excluded.checkouts;
+                INSERT INTO event_hourly_stats (date, hour, checkins, checkouts)
+                VALUES (substr(NEW.ts, 1, 10), substr(NEW.ts, 12, 2), NEW.action = 'in', NEW.action = 'out')
+                ON CONFLICT (date, hour) DO UPDATE SET
+                    checkins = checkins + excluded.checkins,
+                    checkouts = checkouts + excluded.checkouts;
+            END
+        ''')
+        # Backfill existing events (same transaction as the delete, so nothing is counted twice)
+        cursor.execute("DELETE FROM event_daily_user_stats")
+        cursor.execute("DELETE FROM event_hourly_stats")
+        cursor.execute('''
+            INSERT INTO event_daily_user_stats (date, user_id, checkins, checkouts)
+            SELECT substr(ts, 1, 10), user_id, SUM(action = 'in'), SUM(action = 'out')
+            FROM events
+            GROUP BY substr(ts, 1, 10), user_id
+        ''')
+        cursor.execute('''
+            INSERT INTO event_hourly_stats (date, hour, checkins, checkouts)
+            SELECT substr(ts, 1, 10), substr(ts, 12, 2), SUM(action = 'in'), SUM(action = 'out')
+            FROM events
+            GROUP BY substr(ts, 1, 10), substr(ts, 12, 2)
+        ''')
+
     def consume_initial_credentials(self):
         """Return and clear one-time initial credentials."""
         creds = self.initial_credentials
@@ -395,32 +478,79 @@ class Database:
             return cursor.rowcount > 0
 
     # Token operations
+    _ACTIVE_TOKEN_SQL = (
+        "SELECT * FROM tokens WHERE used = 0 "
+        "AND (expires_at IS NULL OR expires_at > datetime('now')) "
+        "ORDER BY created_at DESC LIMIT 1"
+    )
+
     def get_active_token(self) -> Optional[Dict[str, Any]]:
         """Get the active (unused and not expired) global token"""
+        # Терминалы опрашивают токен каждые QR_UPDATE_INTERVAL секунд — отдаём из кэша
+        cached = get_cached_active_token()
+        if cached is not None:
+            return cached
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                "SELECT * FROM tokens WHERE used = 0 "
-                "AND (expires_at IS NULL OR expires_at > datetime('now')) "
-                "ORDER BY created_at DESC LIMIT 1"
-            )
+            cursor.execute(self._ACTIVE_TOKEN_SQL)
             row = cursor.fetchone()
-            return dict(row) if row else None
+            if not row:
+                return None
+            token_data = dict(row)
+            set_cached_active_token(token_data)
+            return token_data
+
+    def get_or_create_active_token(self, token_length: int = 8) -> Dict[str, Any]:
+        """Active token row; issues a new token on the same connection when there is none"""
+        cached = get_cached_active_token()
+        if cached is not None:
+            return cached
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._ACTIVE_TOKEN_SQL)
+            row = cursor.fetchone()
+            if row:
+                token_data = dict(row)
+                set_cached_active_token(token_data)
+                return token_data
+            # Re-check under the write lock so concurrent workers issue only one token
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(self._ACTIVE_TOKEN_SQL)
+            row = cursor.fetchone()
+            token_data = dict(row) if row else self._insert_token(cursor, token_length)
+            conn.commit()
+        invalidate_active_token()
+        return token_data
 
     def create_token(self, token_length: int = 8) -> str:
         """Create new global token"""
-        token = secrets.token_urlsafe(token_length)
-        now = datetime.now(timezone.utc).replace(tzinfo=None)
-        expires_at = now + timedelta(hours=24)  # 24 hours expiry
+        return self.issue_token(token_length)["token"]
 
+    def issue_token(self, token_length: int = 8) -> Dict[str, Any]:
+        """Create new global token and return its row (same shape as get_active_token)"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO tokens (token, location, created_at, expires_at, used) VALUES (?, ?, ?, ?, 0)",
-                (token, "global", now.isoformat(), expires_at.isoformat())
-            )
+            token_data = self._insert_token(conn.cursor(), token_length)
             conn.commit()
-        return token
+        invalidate_active_token()
+        return token_data
+
+    def _insert_token(self, cursor, token_length: int) -> Dict[str, Any]:
+        """Insert a new global token (caller commits) and return its row"""
+        token = secrets.token_urlsafe(token_length)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        expires_at = now + timedelta(hours=24)  # 24 hours expiry
+        token_data = {
+            "token": token,
+            "location": "global",
+            "created_at": now.isoformat(),
+            "expires_at": expires_at.isoformat(),
+            "used": 0,
+        }
+        cursor.execute(
+            "INSERT INTO tokens (token, location, created_at, expires_at, used) VALUES (?, ?, ?, ?, 0)",
+            (token, "global", token_data["created_at"], token_data["expires_at"])
+        )
+        return token_data
 
     def mark_token_used(self, token: str) -> bool:
         """Mark token as used"""
@@ -433,6 +563,7 @@ class Database:
             # Invalidate cache
             if success:
                 invalidate_token(token)
+                invalidate_active_token()
 
             return success
 
@@ -450,6 +581,7 @@ class Database:
             conn.commit()
             if success:
                 invalidate_token(token)
+                invalidate_active_token()
             return success
 
     def get_token_location(self, token: str) -> Optional[str]:
@@ -518,7 +650,9 @@ class Database:
                 (user_id, username, full_name, location, action, now, event_source)
             )
             conn.commit()
-            return cursor.lastrowid
+        # Cached stats of today are stale now (other days are not affected)
+        invalidate_analytics_day(now[:10])
+        return cursor.lastrowid
 
     # Reporting operations
     def get_user_events(self, user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
@@ -636,13 +770,24 @@ class Database:
             user = cursor.fetchone()
 
             if user and JWTHandler.verify_password(password, user['password_hash']):
+                # Lazy upgrade: bcrypt / outdated argon2 parameters -> current argon2id settings.
+                # Hash before the first UPDATE so the SQLite write lock isn't held during argon2
+                new_hash = None
+                if JWTHandler.password_needs_rehash(user['password_hash']):
+                    new_hash = JWTHandler.get_password_hash(password)
                 # Update last login
                 now = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
                 cursor.execute(
                     "UPDATE web_users SET last_login = ? WHERE id = ?",
                     (now, user['id'])
                 )
+                if new_hash is not None:
+                    cursor.execute(
+                        "UPDATE web_users SET password_hash = ? WHERE id = ?",
+                        (new_hash, user['id'])
+                    )
                 conn.commit()
+                invalidate_user(username)
 
                 return dict(user)
             return None
@@ -669,16 +814,34 @@ class Database:
             )
             user_id = cursor.lastrowid
             conn.commit()
+            invalidate_user(username)
 
             return user_id
 
     def get_web_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
-        """Get web user by username"""
+        """Get web user by username (without password_hash; use authenticate_web_user to check passwords)"""
+        # Дёргается на каждой авторизованной странице — кэшируем найденных пользователей
+        cached_user = get_cached_user(username)
+        if cached_user is not None:
+            return cached_user
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM web_users WHERE username = ?", (username,))
             user = cursor.fetchone()
-            return dict(user) if user else None
+            if not user:
+                return None
+            user_data = dict(user)
+            # Хэш пароля не должен попадать в общий кэш (Redis)
+            user_data.pop("password_hash", None)
+            set_cached_user(username, user_data)
+            return user_data
+
+    def _invalidate_web_user(self, cursor, user_id: int):
+        """Drop cached web user row after an update by id"""
+        cursor.execute("SELECT username FROM web_users WHERE id = ?", (user_id,))
+        row = cursor.fetchone()
+        if row:
+            invalidate_user(row[0])
 
     def get_all_web_users(self) -> List[Dict[str, Any]]:
         """Get all web users"""
@@ -703,7 +866,10 @@ class Database:
                 (role, permissions_json, user_id)
             )
             conn.commit()
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
+            if updated:
+                self._invalidate_web_user(cursor, user_id)
+            return updated
 
     def get_user_permissions(self, user_id: int) -> List[str]:
         """Get all permissions for a user (from role + custom permissions)"""
@@ -838,7 +1004,10 @@ class Database:
                 params
             )
             conn.commit()
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
+            if updated:
+                self._invalidate_web_user(cursor, user_id)
+            return updated
 
     def get_web_user_by_id(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Get web user by ID"""
@@ -851,8 +1020,8 @@ class Database:
     def update_web_user(self, user_id: int, full_name: str = None, role: str = None, 
                        department: str = None, position: str = None, 
                        is_active: bool = None, password: str = None,
-                       updated_by: int = None) -> bool:
-        """Update web user information"""
+                       updated_by: int = None) -> Optional[Dict[str, Any]]:
+        """Update web user information; returns the updated row (None if nothing was updated)"""
         import json
         from config.config import USER_ROLES
         
@@ -890,18 +1059,24 @@ class Database:
             params.append(password_hash)
 
         if not updates:
-            return False
+            return None
 
         params.append(user_id)
 
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            # RETURNING: the updated row comes back without a second SELECT
             cursor.execute(
-                f"UPDATE web_users SET {', '.join(updates)} WHERE id = ?",
+                f"UPDATE web_users SET {', '.join(updates)} WHERE id = ? RETURNING *",
                 params
             )
+            row = cursor.fetchone()
             conn.commit()
-            return cursor.rowcount > 0
+            if not row:
+                return None
+            updated_user = dict(row)
+            invalidate_user(updated_user["username"])
+            return updated_user
 
     # Analytics methods
     def get_daily_stats(self, date: str) -> Dict[str, Any]:
@@ -915,18 +1090,28 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
-            # Count check-ins and check-outs for the day
-            # Optimized: use date range instead of DATE() function for better index usage
-            date_start = f"{date}T00:00:00"
-            date_end = f"{date}T23:59:59"
-            cursor.execute('''
-                SELECT
-                    COUNT(CASE WHEN action = 'in' THEN 1 END) as checkins,
-                    COUNT(CASE WHEN action = 'out' THEN 1 END) as checkouts,
-                    COUNT(DISTINCT user_id) as unique_users
-                FROM events
-                WHERE ts >= ? AND ts <= ?
-            ''', (date_start, date_end))
+            if ANALYTICS_AGGREGATES:
+                cursor.execute('''
+                    SELECT
+                        COALESCE(SUM(checkins), 0) as checkins,
+                        COALESCE(SUM(checkouts), 0) as checkouts,
+                        COUNT(*) as unique_users
+                    FROM event_daily_user_stats
+                    WHERE date = ?
+                ''', (date,))
+            else:
+                # Count check-ins and check-outs for the day
+                # Optimized: use date range instead of DATE() function for better index usage
+                date_start = f"{date}T00:00:00"
+                date_end = f"{date}T23:59:59"
+                cursor.execute('''
+                    SELECT
+                        COUNT(CASE WHEN action = 'in' THEN 1 END) as checkins,
+                        COUNT(CASE WHEN action = 'out' THEN 1 END) as checkouts,
+                        COUNT(DISTINCT user_id) as unique_users
+                    FROM events
+                    WHERE ts >= ? AND ts <= ?
+                ''', (date_start, date_end))
 
             result = cursor.fetchone()
             data = dict(result) if result else {'checkins': 0, 'checkouts': 0, 'unique_users': 0}
@@ -938,35 +1123,47 @@ class Database:
 
     def get_weekly_stats(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
         """Get attendance statistics for date range"""
-        # Check cache first (use a composite key for the date range)
-        cache_key = f"{start_date}_{end_date}"
-        cached_data = get_cached_analytics_weekly()
-        if cached_data is not None and cached_data.get("key") == cache_key:
-            return cached_data["data"]
+        # Check cache first (keyed by the date range)
+        cached_data = get_cached_analytics_weekly(start_date, end_date)
+        if cached_data is not None:
+            return cached_data
 
         # Get from database
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
-            # Optimized: use date range with DATE() only in GROUP BY for better performance
-            start_datetime = f"{start_date}T00:00:00"
-            end_datetime = f"{end_date}T23:59:59"
-            cursor.execute('''
-                SELECT
-                    DATE(ts) as date,
-                    COUNT(CASE WHEN action = 'in' THEN 1 END) as checkins,
-                    COUNT(CASE WHEN action = 'out' THEN 1 END) as checkouts,
-                    COUNT(DISTINCT user_id) as unique_users
-                FROM events
-                WHERE ts >= ? AND ts <= ?
-                GROUP BY DATE(ts)
-                ORDER BY DATE(ts)
-            ''', (start_datetime, end_datetime))
+            if ANALYTICS_AGGREGATES:
+                cursor.execute('''
+                    SELECT
+                        date,
+                        SUM(checkins) as checkins,
+                        SUM(checkouts) as checkouts,
+                        COUNT(*) as unique_users
+                    FROM event_daily_user_stats
+                    WHERE date >= ? AND date <= ?
+                    GROUP BY date
+                    ORDER BY date
+                ''', (start_date, end_date))
+            else:
+                # Optimized: use date range with DATE() only in GROUP BY for better performance
+                start_datetime = f"{start_date}T00:00:00"
+                end_datetime = f"{end_date}T23:59:59"
+                cursor.execute('''
+                    SELECT
+                        DATE(ts) as date,
+                        COUNT(CASE WHEN action = 'in' THEN 1 END) as checkins,
+                        COUNT(CASE WHEN action = 'out' THEN 1 END) as checkouts,
+                        COUNT(DISTINCT user_id) as unique_users
+                    FROM events
+                    WHERE ts >= ? AND ts <= ?
+                    GROUP BY DATE(ts)
+                    ORDER BY DATE(ts)
+                ''', (start_datetime, end_datetime))
 
             data = [dict(row) for row in cursor.fetchall()]
 
             # Cache the result
-            set_cached_analytics_weekly({"key": cache_key, "data": data})
+            set_cached_analytics_weekly(start_date, end_date, data)
 
             return data
 
@@ -981,22 +1178,34 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
-            query = '''
-                SELECT
-                    'global' as location,
-                    COUNT(CASE WHEN action = 'in' THEN 1 END) as checkins,
-                    COUNT(CASE WHEN action = 'out' THEN 1 END) as checkouts,
-                    COUNT(DISTINCT user_id) as unique_users
-                FROM events
-            '''
             params = []
-
-            if date:
-                # Optimized: use date range instead of DATE() function
-                date_start = f"{date}T00:00:00"
-                date_end = f"{date}T23:59:59"
-                query += ' WHERE ts >= ? AND ts <= ?'
-                params.extend([date_start, date_end])
+            if ANALYTICS_AGGREGATES:
+                query = '''
+                    SELECT
+                        'global' as location,
+                        COALESCE(SUM(checkins), 0) as checkins,
+                        COALESCE(SUM(checkouts), 0) as checkouts,
+                        COUNT(DISTINCT user_id) as unique_users
+                    FROM event_daily_user_stats
+                '''
+                if date:
+                    query += ' WHERE date = ?'
+                    params.append(date)
+            else:
+                query = '''
+                    SELECT
+                        'global' as location,
+                        COUNT(CASE WHEN action = 'in' THEN 1 END) as checkins,
+                        COUNT(CASE WHEN action = 'out' THEN 1 END) as checkouts,
+                        COUNT(DISTINCT user_id) as unique_users
+                    FROM events
+                '''
+                if date:
+                    # Optimized: use date range instead of DATE() function
+                    date_start = f"{date}T00:00:00"
+                    date_end = f"{date}T23:59:59"
+                    query += ' WHERE ts >= ? AND ts <= ?'
+                    params.extend([date_start, date_end])
 
             cursor.execute(query, params)
             data = [dict(row) for row in cursor.fetchall()]
@@ -1051,19 +1260,27 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
-            # Optimized: use date range instead of DATE() function
-            date_start = f"{date}T00:00:00"
-            date_end = f"{date}T23:59:59"
-            cursor.execute('''
-                SELECT
-                    strftime('%H', ts) as hour,
-                    COUNT(CASE WHEN action = 'in' THEN 1 END) as checkins,
-                    COUNT(CASE WHEN action = 'out' THEN 1 END) as checkouts
-                FROM events
-                WHERE ts >= ? AND ts <= ?
-                GROUP BY strftime('%H', ts)
-                ORDER BY hour
-            ''', (date_start, date_end))
+            if ANALYTICS_AGGREGATES:
+                cursor.execute('''
+                    SELECT hour, checkins, checkouts
+                    FROM event_hourly_stats
+                    WHERE date = ?
+                    ORDER BY hour
+                ''', (date,))
+            else:
+                # Optimized: use date range instead of DATE() function
+                date_start = f"{date}T00:00:00"
+                date_end = f"{date}T23:59:59"
+                cursor.execute('''
+                    SELECT
+                        strftime('%H', ts) as hour,
+                        COUNT(CASE WHEN action = 'in' THEN 1 END) as checkins,
+                        COUNT(CASE WHEN action = 'out' THEN 1 END) as checkouts
+                    FROM events
+                    WHERE ts >= ? AND ts <= ?
+                    GROUP BY strftime('%H', ts)
+                    ORDER BY hour
+                ''', (date_start, date_end))
 
             data = [dict(row) for row in cursor.fetchall()]
 
@@ -1132,43 +1349,31 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
-            # User counts
-            cursor.execute("SELECT COUNT(*) as total_users FROM people")
-            total_users = cursor.fetchone()['total_users']
-
-            cursor.execute("SELECT COUNT(*) as total_web_users FROM web_users")
-            total_web_users = cursor.fetchone()['total_web_users']
-
-            # Event counts
-            cursor.execute("SELECT COUNT(*) as total_events FROM events")
-            total_events = cursor.fetchone()['total_events']
-
-            # Recent activity (last 24 hours)
+            # All counters in one statement (one parse/plan/step instead of five)
             cursor.execute('''
-                SELECT COUNT(*) as recent_events
-                FROM events
-                WHERE ts >= datetime('now', '-1 day')
+                SELECT
+                    (SELECT COUNT(*) FROM people) as total_users,
+                    (SELECT COUNT(*) FROM web_users) as total_web_users,
+                    (SELECT COUNT(*) FROM events) as total_events,
+                    -- Recent activity (last 24 hours)
+                    (SELECT COUNT(*) FROM events WHERE ts >= datetime('now', '-1 day')) as recent_events,
+                    -- Token stats (only unused and not expired)
+                    (SELECT COUNT(*) FROM tokens WHERE used = 0
+                        AND (expires_at IS NULL OR expires_at > datetime('now'))) as active_tokens
             ''')
-            recent_events = cursor.fetchone()['recent_events']
-
-            # Token stats (only unused and not expired)
-            cursor.execute(
-                "SELECT COUNT(*) as active_tokens FROM tokens WHERE used = 0 "
-                "AND (expires_at IS NULL OR expires_at > datetime('now'))"
-            )
-            active_tokens = cursor.fetchone()['active_tokens']
+            row = cursor.fetchone()
 
             data = {
                 'users': {
-                    'telegram_users': total_users,
-                    'web_users': total_web_users
+                    'telegram_users': row['total_users'],
+                    'web_users': row['total_web_users']
                 },
                 'events': {
-                    'total': total_events,
-                    'recent_24h': recent_events
+                    'total': row['total_events'],
+                    'recent_24h': row['recent_events']
                 },
                 'tokens': {
-                    'active': active_tokens
+                    'active': row['active_tokens']
                 },
                 'generated_at': datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
             }
@@ -1276,6 +1481,10 @@ class Database:
 
     def get_employees_by_date(self, date: str) -> List[Dict[str, Any]]:
         """Get list of employees who visited on a specific date with all work intervals"""
+        cached_data = get_cached_employees_by_date(date)
+        if cached_data is not None:
+            return cached_data
+
         with self.get_connection() as conn:
             cursor = conn.cursor()
 
@@ -1385,6 +1594,7 @@ class Database:
 
             # Сортируем по первому приходу (checkin_time) для стабильного порядка
             result.sort(key=lambda x: x["checkin_time"] or "")
+            set_cached_employees_by_date(date, result)
             return result
 
     def get_top_workers(self, limit: int = 5) -> List[Dict[str, Any]]:
@@ -24,6 +24,14 @@ class TestAnalyticsAPI:
         assert isinstance(data["checkouts"], int)
         assert isinstance(data["unique_users"], int)
 
+    def test_invalid_date_rejected(self, test_client, auth_headers):
+        """Per-date endpoints answer 400 for anything but a YYYY-MM-DD calendar date"""
+        for bad in ("2025-13-01", "2025-1-5", "yesterday"):
+            response = test_client.get(f"/api/analytics/daily/{bad}", headers=auth_headers)
+            assert response.status_code == 400
+        response = test_client.get("/api/analytics/hourly/2025-02-30", headers=auth_headers)
+        assert response.status_code == 400
+
     def test_get_weekly_analytics(self, test_client, auth_headers):
         """Test weekly analytics endpoint"""
         response = test_client.get("/api/analytics/weekly", headers=auth_headers)
@@ -62,6 +70,17 @@ class TestAnalyticsAPI:
         assert "users" in data
         assert isinstance(data["users"], list)
 
+    def test_user_analytics_limit_clamped(self, test_client, auth_headers, monkeypatch):
+        """Out-of-range limit values are clamped before reaching the database"""
+        from backend import main
+
+        seen = []
+        monkeypatch.setattr(main.db, "get_user_stats", lambda limit: seen.append(limit) or [])
+        for limit in (0, 10_000_000):
+            response = test_client.get(f"/api/analytics/users?limit={limit}", headers=auth_headers)
+            assert response.status_code == 200
+        assert seen == [1, main.ANALYTICS_USERS_MAX_LIMIT]
+
     def test_get_hourly_analytics(self, test_client, auth_headers):
         """Test hourly analytics endpoint"""
         today = datetime.now().strftime('%Y-%m-%d')
@@ -126,3 +145,128 @@ class TestAnalyticsDatabase:
         assert "total" in stats["events"]
         assert "recent_24h" in stats["events"]
         assert "active" in stats["tokens"]
+
+    def test_aggregates_match_raw_scan(self, test_db, monkeypatch):
+        """Summary tables (trigger-maintained and backfilled) give the same numbers as the events scan"""
+        import database
+        from utils.cache import cache
+
+        test_db.create_event(501, "office", "in")
+        test_db.create_event(501, "office", "out")
+        test_db.create_event(502, "office", "in")
+        day = test_db.get_user_events(501, limit=1)[0]["ts"][:10]
+
+        def snapshot():
+            cache.clear()
+            return (
+                test_db.get_daily_stats(day),
+                test_db.get_weekly_stats(day, day),
+                test_db.get_location_stats(day),
+                test_db.get_location_stats(),
+                test_db.get_hourly_stats(day),
+            )
+
+        aggregated = snapshot()
+        assert aggregated[0] == {"checkins": 2, "checkouts": 1, "unique_users": 2}
+        monkeypatch.setattr(database, "ANALYTICS_AGGREGATES", False)
+        assert snapshot() == aggregated
+
+        # Existing databases are backfilled when the trigger is first created
+        with test_db.get_connection() as conn:
+            conn.execute("DROP TRIGGER trg_events_stats")
+            conn.execute("DELETE FROM event_daily_user_stats")
+            conn.commit()
+        type(test_db)(test_db.db_path)
+        monkeypatch.setattr(database, "ANALYTICS_AGGREGATES", True)
+        assert snapshot() == aggregated
+        cache.clear()
+
+    def test_new_event_invalidates_day_cache(self, test_db):
+        """Cached stats of the event's day are dropped on insert; ranges are cached per range"""
+        from datetime import timezone
+        from utils.cache import cache
+
+        cache.clear()
+        today = datetime.now(timezone.utc).date().isoformat()
+        before = test_db.get_daily_stats(today)["checkins"]
+        test_db.create_event(601, "office", "in")
+        assert test_db.get_daily_stats(today)["checkins"] == before + 1
+
+        assert test_db.get_weekly_stats("2025-12-01", "2025-12-07") == []
+        assert test_db.get_weekly_stats(today, today)[0]["checkins"] == before + 1
+
+        # Ranges containing today and top users are dropped too; closed ranges stay
+        users_before = {u["user_id"]: u for u in test_db.get_user_stats(50)}.get(601, {}).get("checkins", 0)
+        test_db.create_event(601, "office", "in")
+        assert test_db.get_weekly_stats(today, today)[0]["checkins"] == before + 2
+        assert {u["user_id"]: u for u in test_db.get_user_stats(50)}[601]["checkins"] == users_before + 1
+        assert cache.exists("analytics:weekly:2025-12-01:2025-12-07")
+        cache.clear()
+
+    def test_closed_day_cache_ttl(self):
+        """Past dates are cached for long, today and future dates for the short TTL"""
+        from datetime import timedelta, timezone
+        from utils.cache import analytics_day_ttl
+        from config.config import CACHE_TTL_ANALYTICS, CACHE_TTL_ANALYTICS_CLOSED_DAY
+
+        today = datetime.now(timezone.utc).date()
+        assert analytics_day_ttl((today - timedelta(days=1)).isoformat()) == CACHE_TTL_ANALYTICS_CLOSED_DAY
+        assert analytics_day_ttl(today.isoformat()) == CACHE_TTL_ANALYTICS
+        assert analytics_day_ttl((today + timedelta(days=1)).isoformat()) == CACHE_TTL_ANALYTICS
+
+    def test_singleflight_coalesces_concurrent_calls(self):
+        """Concurrent calls with the same key share one execution"""
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        from utils.singleflight import SingleFlight
+
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def query():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {"checkins": 1}
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            leader = pool.submit(flight.do, ("daily", "2025-01-15"), query)
+            # Followers are submitted only once the leader's query is in flight
+            assert started.wait(5)
+            followers = [pool.submit(flight.do, ("daily", "2025-01-15"), query) for _ in range(3)]
+            # Give followers time to reach the shared Future before releasing the leader
+            release.wait(0.05)
+            release.set()
+            results = [f.result(timeout=5) for f in [leader, *followers]]
+
+        assert len(calls) == 1
+        assert all(r == {"checkins": 1} for r in results)
+        assert flight.do(("daily", "2025-01-15"), query) == {"checkins": 1}
+        assert len(calls) == 2
+
+    def test_singleflight_caps_concurrency(self):
+        """Distinct keys beyond max_concurrent wait for a free slot"""
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        from utils.singleflight import SingleFlight
+
+        flight = SingleFlight(max_concurrent=2)
+        lock = threading.Lock()
+        running = [0, 0]  # current, peak
+
+        def query(n):
+            with lock:
+                running[0] += 1
+                running[1] = max(running[1], running[0])
+            threading.Event().wait(0.02)
+            with lock:
+                running[0] -= 1
+            return n
+
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            results = list(pool.map(lambda n: flight.do(("daily", n), query, n), range(6)))
+
+        assert results == list(range(6))
+        assert running[1] <= 2
@@ -16,6 +16,29 @@ class TestAPIEndpoints:
         assert "url" in data
         assert len(data["token"]) > 0
 
+    def test_active_token_etag(self, test_client, auth_headers):
+        """Unchanged token is revalidated with 304"""
+        response = test_client.get("/api/active_token", headers=auth_headers)
+        etag = response.headers["etag"]
+        assert etag == f'"{response.json()["token"]}"'
+
+        cached = test_client.get("/api/active_token", headers={**auth_headers, "If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+        stale = test_client.get("/api/active_token", headers={**auth_headers, "If-None-Match": '"old"'})
+        assert stale.status_code == 200
+
+    def test_device_token_etag(self, test_client):
+        """Device endpoint revalidates with 304 while the token is unchanged"""
+        response = test_client.get("/api/token")
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+
+        cached = test_client.get("/api/token", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
     def test_web_interface_endpoints(self, test_client):
         """Test web interface endpoints"""
         # Login page should be accessible without auth
@@ -32,6 +55,21 @@ class TestAPIEndpoints:
         assert response.status_code == 302
         assert "/login" in response.headers.get("location", "")
 
+        # Страницы с проверкой JWT из сессии
+        for path in ("/me", "/analytics", "/users"):
+            response = test_client.get(path, allow_redirects=False)
+            assert response.status_code == 302
+            assert "/login" in response.headers.get("location", "")
+
+    def test_terminal_page_prerendered(self):
+        """Terminal HTML is rendered once and reused"""
+        from backend import main
+
+        body = main.terminal_response().body
+        assert f"var updateInterval = {main.QR_UPDATE_INTERVAL * 1000};".encode() in body
+        if not main.TEMPLATES_AUTO_RELOAD:
+            assert main.terminal_response().body is body
+
     def test_openapi_documentation(self, test_client):
         """Test OpenAPI documentation endpoints"""
         # OpenAPI JSON schema
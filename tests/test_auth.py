@@ -2,6 +2,7 @@
 Tests for authentication system
 """
 import pytest
+from unittest.mock import patch
 from auth.jwt_handler import JWTHandler
 
 class TestJWTHandler:
@@ -20,6 +21,32 @@ class TestJWTHandler:
         assert JWTHandler.verify_password(password, hashed)
         assert not JWTHandler.verify_password("wrong_password", hashed)
 
+    def test_verify_password_cache(self):
+        """Successful checks are cached, failures always hit the hasher"""
+        from auth import jwt_handler
+        hashed = JWTHandler.get_password_hash("cached_password_1")
+        assert JWTHandler.verify_password("cached_password_1", hashed)
+
+        with patch.object(JWTHandler, "_check_password", side_effect=AssertionError("cache miss")):
+            assert JWTHandler.verify_password("cached_password_1", hashed)
+
+        with patch.object(JWTHandler, "_check_password", return_value=False) as verify:
+            assert not JWTHandler.verify_password("wrong_password", hashed)
+            assert not JWTHandler.verify_password("wrong_password", hashed)
+            assert verify.call_count == 2
+
+        jwt_handler._pw_cache.clear()
+
+    def test_legacy_bcrypt_hash_still_verifies(self):
+        """Hashes created before the argon2-cffi switch keep working"""
+        import bcrypt
+        legacy = bcrypt.hashpw(b"legacy_password_1", bcrypt.gensalt(rounds=4)).decode()
+        assert JWTHandler.verify_password("legacy_password_1", legacy)
+        assert not JWTHandler.verify_password("wrong_password", legacy)
+        assert JWTHandler.get_password_hash("legacy_password_1").startswith("$argon2id$")
+        assert JWTHandler.password_needs_rehash(legacy)
+        assert not JWTHandler.password_needs_rehash(JWTHandler.get_password_hash("legacy_password_1"))
+
     def test_token_creation_and_verification(self):
         """Test JWT token creation and verification"""
         test_data = {"sub": "testuser", "role": "admin"}
@@ -41,6 +68,93 @@ class TestJWTHandler:
         assert JWTHandler.verify_token("invalid_token") is None
         assert JWTHandler.verify_token("") is None
 
+    def test_decode_rejects_tampered_and_unsigned_tokens(self):
+        """Signature, algorithm and exp are all enforced by the fast decode path"""
+        import base64
+        import json
+        from auth import jwt_handler
+        token = JWTHandler.create_access_token({"sub": "victim", "role": "user"})
+        header, payload, signature = token.split(".")
+
+        forged = base64.urlsafe_b64encode(
+            json.dumps({"sub": "victim", "role": "admin", "exp": 9999999999}).encode()
+        ).rstrip(b"=").decode()
+        assert JWTHandler._decode(f"{header}.{forged}.{signature}") is None
+
+        none_header = base64.urlsafe_b64encode(b'{"alg":"none","typ":"JWT"}').rstrip(b"=").decode()
+        assert JWTHandler._decode(f"{none_header}.{payload}.") is None
+
+        no_exp = jwt_handler.jwt.encode({"sub": "victim"}, JWTHandler.SECRET_KEYS[0], algorithm="HS256")
+        assert JWTHandler._decode(no_exp) is None
+
+    def test_decode_accepts_previous_key(self):
+        """Tokens signed with a rotated-out key still verify"""
+        from auth import jwt_handler
+        token = jwt_handler.jwt.encode(
+            {"sub": "rotated", "exp": 9999999999}, "previous-secret", algorithm="HS256"
+        )
+        assert JWTHandler._decode(token) is None
+        with patch.object(jwt_handler, "_KEYS_BYTES", jwt_handler._KEYS_BYTES + [b"previous-secret"]):
+            assert JWTHandler._decode(token)["sub"] == "rotated"
+            # The matching key is remembered and tried first next time
+            assert jwt_handler._last_ok_idx == 1
+            fresh = JWTHandler.create_access_token({"sub": "fresh"})
+            assert JWTHandler._decode(fresh)["sub"] == "fresh"
+            assert jwt_handler._last_ok_idx == 0
+
+    def test_decode_reuses_verified_signature(self):
+        """Repeat decodes skip the HMAC; a different signature is still rejected"""
+        from auth import jwt_handler, jwt_fast
+        token = JWTHandler.create_access_token({"sub": "digest", "role": "user"})
+        assert JWTHandler._decode(token)["sub"] == "digest"
+
+        with patch.object(jwt_fast, "check_signature", side_effect=AssertionError("hmac recomputed")):
+            assert JWTHandler._decode(token)["sub"] == "digest"
+
+        signing_input, _, signature = token.rpartition(".")
+        forged_sig = ("A" if signature[0] != "A" else "B") + signature[1:]
+        assert JWTHandler._decode(f"{signing_input}.{forged_sig}") is None
+
+        jwt_handler._sig_cache.clear()
+
+    def test_verify_token_cache_hit(self):
+        """Repeated verification is served from the cache"""
+        from auth import jwt_handler
+        token = JWTHandler.create_access_token({"sub": "cached", "role": "user"})
+
+        first = JWTHandler.verify_token(token)
+        assert first is not None
+        with patch.object(JWTHandler, "_decode", side_effect=AssertionError("cache miss")):
+            assert JWTHandler.verify_token(token) == first
+
+        jwt_handler._verify_cache.clear()
+
+    def test_forget_token_drops_cached_payload(self):
+        """Logout removes the token from the verification cache"""
+        from auth import jwt_handler
+        token = JWTHandler.create_access_token({"sub": "leaving", "role": "user"})
+        assert JWTHandler.verify_token(token) is not None
+        assert len(jwt_handler._verify_cache) > 0
+
+        JWTHandler.forget_token(token)
+        with patch.object(JWTHandler, "_decode", return_value=None) as decode:
+            assert JWTHandler.verify_token(token) is None
+            decode.assert_called_once()
+
+        jwt_handler._verify_cache.clear()
+
+    def test_verify_token_cache_respects_exp(self):
+        """Cached payload is not returned after the token expires"""
+        from auth import jwt_handler
+        token = JWTHandler.create_access_token({"sub": "short", "role": "user"})
+        payload = JWTHandler.verify_token(token)
+        assert payload is not None
+
+        with patch("auth.jwt_handler.time.time", return_value=payload["exp"] + 1):
+            assert JWTHandler.verify_token(token) is None
+
+        jwt_handler._verify_cache.clear()
+
     def test_get_current_user(self):
         """Test getting current user from token"""
         test_data = {"sub": "testuser", "role": "user"}
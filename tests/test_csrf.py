@@ -6,7 +6,7 @@ import time
 from fastapi import Request
 from unittest.mock import Mock, MagicMock
 from utils.csrf import (
-    generate_csrf_token, get_csrf_token, set_csrf_token,
+    generate_csrf_token, get_csrf_token, set_csrf_token, ensure_csrf_token,
     validate_csrf_token, require_csrf_token
 )
 
@@ -58,6 +58,15 @@ class TestCSRFToken:
         assert result == custom_token
         assert request.session["csrf_token"] == custom_token
 
+    def test_ensure_csrf_token_reuses_session_token(self):
+        """Existing session token is reused, a new one is created only if missing"""
+        request = Mock(spec=Request)
+        request.session = {}
+
+        token = ensure_csrf_token(request)
+        assert request.session["csrf_token"] == token
+        assert ensure_csrf_token(request) == token
+
 
 class TestCSRFValidation:
     """Test CSRF token validation"""
@@ -30,6 +30,7 @@ class TestDatabase:
         assert user["username"] == sample_user_data["username"]
         assert user["full_name"] == sample_user_data["full_name"]
         assert user["role"] == sample_user_data["role"]
+        assert "password_hash" not in user
 
         # Test authentication
         authenticated = test_db.authenticate_web_user(
@@ -46,6 +47,13 @@ class TestDatabase:
         )
         assert wrong_auth is None
 
+        # Cached user row is refreshed after an update
+        updated = test_db.update_web_user(user_id, full_name="Renamed User")
+        assert updated["id"] == user_id
+        assert updated["full_name"] == "Renamed User"
+        user = test_db.get_web_user_by_username(sample_user_data["username"])
+        assert user["full_name"] == "Renamed User"
+
     def test_token_operations(self, test_db):
         """Test token generation and validation"""
         # Create token
@@ -68,6 +76,35 @@ class TestDatabase:
         is_valid_after_use = test_db.is_token_valid(token)
         assert is_valid_after_use is False
 
+    def test_issue_token_returns_row(self, test_db):
+        """issue_token returns the same row get_active_token reads back"""
+        issued = test_db.issue_token()
+        active = test_db.get_active_token()
+        assert active["token"] == issued["token"]
+        assert active["created_at"] == issued["created_at"]
+
+    def test_get_or_create_active_token(self, test_db):
+        """Issues a token only when there is no active one"""
+        first = test_db.get_or_create_active_token()
+        assert test_db.get_active_token()["token"] == first["token"]
+        assert test_db.get_or_create_active_token()["token"] == first["token"]
+
+        test_db.mark_token_used_if_valid(first["token"])
+        second = test_db.get_or_create_active_token()
+        assert second["token"] != first["token"]
+
+    def test_active_token_cache_invalidation(self, test_db):
+        """Cached active token is dropped when a token is issued or used"""
+        token = test_db.create_token()
+        assert test_db.get_active_token()["token"] == token
+
+        newer = test_db.create_token()
+        assert test_db.get_active_token()["token"] == newer
+
+        test_db.mark_token_used_if_valid(newer)
+        active = test_db.get_active_token()
+        assert active is None or active["token"] != newer
+
     def test_person_operations(self, test_db):
         """Test person (Telegram user) operations"""
         tg_user_id = 123456789
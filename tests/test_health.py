@@ -33,3 +33,30 @@ def test_active_token():
     assert "token" in data and data["token"]
     assert "url" in data and "t.me" in data["url"]
 
+
+
+def test_static_endpoints_cacheable():
+    resp = client.get("/robots.txt")
+    assert resp.status_code == 200
+    assert "max-age=86400" in resp.headers["cache-control"]
+    assert client.get("/favicon.ico").headers["cache-control"].startswith("public")
+    assert client.get("/api/health").headers["cache-control"] == "public, max-age=5"
+
+
+def test_metrics_endpoint():
+    resp = client.get("/api/metrics")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert set(data) == {"timestamp", "database", "redis", "system", "application"}
+
+
+def test_metrics_omits_application_on_failure(monkeypatch):
+    from backend import main
+
+    def fail():
+        raise RuntimeError("db unavailable")
+
+    monkeypatch.setattr(main.db, "get_system_health_stats", fail)
+    resp = client.get("/api/metrics")
+    assert resp.status_code == 200
+    assert "application" not in resp.json()
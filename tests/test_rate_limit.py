@@ -31,6 +31,43 @@ class TestRateLimit:
         ip = get_client_ip(request)
         assert ip == "10.0.0.1"
 
+    def test_get_client_ip_forwarded_only_from_trusted_proxy(self):
+        """X-Forwarded-For is used behind a trusted proxy and ignored otherwise"""
+        request = Mock(spec=Request)
+        request.client = Mock()
+        request.client.host = "172.18.0.5"
+        request.headers = {"X-Forwarded-For": "198.51.100.4, 172.18.0.1"}
+        assert get_client_ip(request) == "198.51.100.4"
+
+        request.client.host = "203.0.113.9"
+        assert get_client_ip(request) == "203.0.113.9"
+
+    def test_get_client_ip_ignores_forged_forwarded_entry(self):
+        """Left-most X-Forwarded-For entries are client-controlled and skipped"""
+        request = Mock(spec=Request)
+        request.client = Mock()
+        request.client.host = "172.18.0.5"
+        # Client sent "X-Forwarded-For: 1.2.3.4", proxy appended the real peer
+        request.headers = {"X-Forwarded-For": "1.2.3.4, 198.51.100.4"}
+        assert get_client_ip(request) == "198.51.100.4"
+
+        request.headers = {"X-Forwarded-For": "10.0.0.9, 198.51.100.4, 172.18.0.1"}
+        assert get_client_ip(request) == "198.51.100.4"
+
+    def test_public_172_is_not_trusted_proxy(self):
+        """Only 172.16.0.0/12 counts as a private proxy range"""
+        from utils.rate_limit import is_trusted_proxy
+
+        assert is_trusted_proxy("172.20.1.1")
+        assert not is_trusted_proxy("172.32.0.1")
+        assert not is_trusted_proxy("not-an-ip")
+
+        request = Mock(spec=Request)
+        request.client = Mock()
+        request.client.host = "172.32.0.1"
+        request.headers = {"X-Forwarded-For": "198.51.100.4"}
+        assert get_client_ip(request) == "172.32.0.1"
+
     def test_get_client_ip_unknown(self):
         """Test getting client IP when unavailable"""
         request = Mock(spec=Request)
@@ -45,14 +82,13 @@ class TestRateLimit:
         request = Mock(spec=Request)
         request.client = Mock()
         request.client.host = "192.168.1.1"
+        request.headers = {}
         request.method = "GET"
         
         # Mock cache to allow requests
         original_redis = cache.redis_client
         cache.redis_client = Mock()
-        cache.redis_client.exists.return_value = False
-        cache.redis_client.incr.return_value = 1
-        cache.redis_client.expire.return_value = True
+        cache.redis_client.pipeline.return_value.execute.return_value = [False, 1, True]
         
         try:
             result = rate_limit(request, max_requests=10, window_seconds=60, key_prefix="test")
@@ -65,12 +101,13 @@ class TestRateLimit:
         request = Mock(spec=Request)
         request.client = Mock()
         request.client.host = "192.168.1.1"
+        request.headers = {}
         request.method = "GET"
         
         # Mock cache to indicate blocking
         original_redis = cache.redis_client
         cache.redis_client = Mock()
-        cache.redis_client.exists.return_value = True  # Already blocked
+        cache.redis_client.pipeline.return_value.execute.return_value = [True, 3, False]  # Already blocked
         
         try:
             from fastapi import HTTPException
@@ -85,14 +122,13 @@ class TestRateLimit:
         request = Mock(spec=Request)
         request.client = Mock()
         request.client.host = "192.168.1.1"
+        request.headers = {}
         request.method = "GET"
         
         # Mock cache to exceed limit
         original_redis = cache.redis_client
         cache.redis_client = Mock()
-        cache.redis_client.exists.return_value = False
-        cache.redis_client.incr.return_value = 11  # Exceeds limit of 10
-        cache.redis_client.expire.return_value = True
+        cache.redis_client.pipeline.return_value.execute.return_value = [False, 11, False]  # Exceeds limit of 10
         cache.redis_client.set.return_value = True
         
         try:
@@ -108,12 +144,13 @@ class TestRateLimit:
         request = Mock(spec=Request)
         request.client = Mock()
         request.client.host = "192.168.1.1"
+        request.headers = {}
         request.method = "GET"
         
         # Mock cache to raise exception
         original_redis = cache.redis_client
         cache.redis_client = Mock()
-        cache.redis_client.exists.side_effect = Exception("Redis error")
+        cache.redis_client.pipeline.side_effect = Exception("Redis error")
         
         try:
             # Should not raise exception, should allow request
@@ -142,3 +179,65 @@ class TestRateLimitIntegration:
             if i >= 5:
                 assert response.status_code in [200, 403, 429]
 
+
+    def test_login_memory_limiter_window(self):
+        """Memory fallback blocks after MAX_LOGIN_ATTEMPTS failures inside the window"""
+        from backend import main
+
+        ip = "203.0.113.7"
+        now = time.monotonic()
+        main.LOGIN_ATTEMPTS.pop(ip, None)
+        try:
+            for i in range(main.MAX_LOGIN_ATTEMPTS - 1):
+                main._record_failed_login(ip, now + i)
+            assert main._login_retry_after_in_memory(ip, now + 10) == 0
+
+            main._record_failed_login(ip, now + 10)
+            assert main._login_retry_after_in_memory(ip, now + 10) == main.LOGIN_WINDOW_SEC - 10
+            # Ring buffer stays bounded
+            assert len(main.LOGIN_ATTEMPTS[ip]) == main.MAX_LOGIN_ATTEMPTS
+            # Oldest failure leaves the window -> unblocked
+            assert main._login_retry_after_in_memory(ip, now + main.LOGIN_WINDOW_SEC + 1) == 0
+        finally:
+            main.LOGIN_ATTEMPTS.pop(ip, None)
+
+    def test_login_redis_sliding_window(self):
+        """Lua limiter counts attempts in the window and sets the block key"""
+        fakeredis = pytest.importorskip("fakeredis", reason="fakeredis from requirements-dev.txt runs the login Lua script")
+        pytest.importorskip("lupa", reason="lupa from requirements-dev.txt gives fakeredis Lua support")
+        from backend import main
+
+        original_redis, original_script = cache.redis_client, main._login_script
+        cache.redis_client = fakeredis.FakeRedis()
+        main._login_script = None
+        ip = "203.0.113.8"
+        now = time.time()
+        try:
+            results = [main._redis_login_attempt(ip, now + i) for i in range(main.MAX_LOGIN_ATTEMPTS + 1)]
+            assert results == [(n, 0) for n in range(1, main.MAX_LOGIN_ATTEMPTS + 1)] + [
+                (main.MAX_LOGIN_ATTEMPTS + 1, main.LOGIN_BLOCK_SEC)
+            ]
+            assert cache.redis_client.exists(f"login:block:{ip}")
+            count, retry_after = main._redis_login_attempt(ip, now + 10)
+            assert count == -1
+            assert 0 < retry_after <= main.LOGIN_BLOCK_SEC
+
+            # Attempts older than the window are dropped from the log
+            cache.redis_client.delete(f"login:block:{ip}")
+            assert main._redis_login_attempt(ip, now + main.LOGIN_WINDOW_SEC + 20) == (1, 0)
+        finally:
+            cache.redis_client, main._login_script = original_redis, original_script
+
+    def test_login_blocked_page(self):
+        """Blocked login page is a pre-rendered 429 with escaped substitutions"""
+        from backend import main
+
+        request = Mock()
+        request.session = {"csrf_token": "csrf-abc"}
+        response = main.login_blocked_response(request, '/admin"><script>', retry_after=42)
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "42"
+        body = response.body.decode()
+        assert 'value="csrf-abc"' in body
+        assert "&#34;&gt;&lt;script&gt;" in body
+        assert "Слишком много попыток" in body
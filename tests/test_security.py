@@ -8,6 +8,20 @@ from database import Database
 from utils.validators import sanitize_string
 
 
+@pytest.fixture
+def api_web_user():
+    """Web user in the app's database (the one /api/user/{id} reads)"""
+    import uuid
+    from backend import main
+
+    username = f"shape_{uuid.uuid4().hex[:8]}"
+    user_id = main.db.create_web_user(username=username, password="shape-pass-123", full_name="Shape User")
+    yield user_id
+    with main.db.get_connection() as conn:
+        conn.execute("DELETE FROM web_users WHERE id = ?", (user_id,))
+        conn.commit()
+
+
 class TestSQLInjection:
     """Test SQL injection protection"""
 
@@ -149,6 +163,18 @@ class TestAuthorization:
         # Should succeed (or 404 if user doesn't exist, but not 403)
         assert response.status_code != 403
 
+    def test_user_api_returns_public_fields_only(self, test_client, auth_headers, api_web_user):
+        """User API keeps the UserResponse shape"""
+        from backend.schemas import UserResponse
+
+        response = test_client.get(f"/api/user/{api_web_user}", headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert "password_hash" not in data
+        assert set(data) == set(UserResponse.model_fields)
+        assert data["id"] == api_web_user
+        assert isinstance(data["is_active"], bool)
+
     def test_role_based_access_control(self, test_client):
         """Test role-based access control"""
         from auth.jwt_handler import JWTHandler
@@ -0,0 +1,59 @@
+"""
+Tests for the cached session middleware
+"""
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from utils.session import CachedSessionMiddleware
+
+
+@pytest.fixture
+def session_client():
+    app = FastAPI()
+    app.add_middleware(CachedSessionMiddleware, secret_key="session-test-key", max_age=3600)
+
+    @app.get("/set")
+    async def set_value(request: Request):
+        request.session["user"] = "alice"
+        return {"ok": True}
+
+    @app.get("/get")
+    async def get_value(request: Request):
+        return {"user": request.session.get("user")}
+
+    @app.get("/clear")
+    async def clear(request: Request):
+        request.session.clear()
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+class TestCachedSessionMiddleware:
+    """Test session cookie round-trip and re-signing behaviour"""
+
+    def test_session_round_trip(self, session_client):
+        """Session values survive between requests"""
+        response = session_client.get("/set")
+        assert "set-cookie" in response.headers
+        assert session_client.get("/get").json() == {"user": "alice"}
+
+    def test_unchanged_session_not_resigned(self, session_client):
+        """Read-only requests do not emit a new cookie"""
+        session_client.get("/set")
+        response = session_client.get("/get")
+        assert response.json() == {"user": "alice"}
+        assert "set-cookie" not in response.headers
+
+    def test_tampered_cookie_rejected(self, session_client):
+        """Invalid signature yields an empty session"""
+        session_client.get("/set")
+        cookie = session_client.cookies.get("session")
+        session_client.cookies.set("session", cookie[:-2] + "xx")
+        assert session_client.get("/get").json() == {"user": None}
+
+    def test_clear_expires_cookie(self, session_client):
+        """Clearing the session expires the cookie"""
+        session_client.get("/set")
+        response = session_client.get("/clear")
+        assert "1970" in response.headers["set-cookie"]
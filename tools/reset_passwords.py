@@ -8,6 +8,7 @@ sys.path.append('.')
 
 from database import Database
 from auth.jwt_handler import JWTHandler
+from utils.cache import invalidate_user
 from tools.default_users import get_default_users_for_reset_passwords
 
 
@@ -22,6 +23,8 @@ def reset_passwords():
 
     print("\n👤 Updating/Creating users...")
 
+    updated_usernames = []
+
     with db.get_connection() as conn:
         cursor = conn.cursor()
 
@@ -50,6 +53,7 @@ def reset_passwords():
                     user_data['position'],
                     username
                 ))
+                updated_usernames.append(username)
                 print(f"   ✅ Updated user: {username} ({user_data['role']}) - password: {password}")
             else:
                 # Create new user
@@ -79,6 +83,10 @@ def reset_passwords():
 
         conn.commit()
 
+    # Drop cached rows so the web app and bot see the new hash/role right away
+    for username in updated_usernames:
+        invalidate_user(username)
+
     print("\n📋 All user credentials:")
     print("-" * 50)
     with db.get_connection() as conn:
@@ -3,11 +3,13 @@ Redis caching system for the attendance application
 """
 import json
 import pickle
-from typing import Any, Optional, Union
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Union
 import redis
 from config.config import (
     REDIS_ENABLED, REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_PASSWORD,
-    CACHE_TTL_TOKEN, CACHE_TTL_ANALYTICS, CACHE_TTL_USER
+    CACHE_TTL_TOKEN, CACHE_TTL_ANALYTICS, CACHE_TTL_ANALYTICS_CLOSED_DAY, CACHE_TTL_USER,
+    CACHE_TTL_ACTIVE_TOKEN
 )
 from utils.logger import logger
 
@@ -94,21 +96,36 @@ class Cache:
             logger.error(f"Cache set error for key {key}: {e}")
             return False
 
-    def delete(self, key: str) -> bool:
-        """Delete value from cache"""
+    def delete(self, *keys: str) -> bool:
+        """Delete one or more values from cache (one Redis round-trip)"""
         try:
             if self.redis_client:
-                return bool(self.redis_client.delete(key))
+                return bool(self.redis_client.delete(*keys))
             else:
                 # Memory cache fallback
-                if key in self.memory_cache:
-                    del self.memory_cache[key]
-                    return True
-                return False
+                deleted = False
+                for key in keys:
+                    if key in self.memory_cache:
+                        del self.memory_cache[key]
+                        deleted = True
+                return deleted
         except Exception as e:
-            logger.error(f"Cache delete error for key {key}: {e}")
+            logger.error(f"Cache delete error for keys {keys}: {e}")
             return False
 
+    def keys(self, prefix: str) -> List[str]:
+        """Keys starting with prefix (SCAN on Redis — meant for small key families)"""
+        try:
+            if self.redis_client:
+                return [
+                    key.decode() if isinstance(key, bytes) else key
+                    for key in self.redis_client.scan_iter(match=f"{prefix}*", count=500)
+                ]
+            return [key for key in list(self.memory_cache) if key.startswith(prefix)]
+        except Exception as e:
+            logger.error(f"Cache keys error for prefix {prefix}: {e}")
+            return []
+
     def exists(self, key: str) -> bool:
         """Check if key exists in cache"""
         try:
@@ -164,12 +181,14 @@ class Cache:
 class CacheKeys:
     """Cache key constants"""
     TOKEN = "token:{}"  # token:{token_value}
+    ACTIVE_TOKEN = "active_token"  # current global QR token row
     USER = "user:{}"    # user:{username}
     ANALYTICS_DAILY = "analytics:daily:{}"  # analytics:daily:{date}
-    ANALYTICS_WEEKLY = "analytics:weekly"   # analytics:weekly
+    ANALYTICS_WEEKLY = "analytics:weekly:{}:{}"   # analytics:weekly:{start_date}:{end_date}
     ANALYTICS_LOCATION = "analytics:location:{}"  # analytics:location:{date}
     ANALYTICS_USER = "analytics:user:{}"    # analytics:user:{limit}
     ANALYTICS_HOURLY = "analytics:hourly:{}"  # analytics:hourly:{date}
+    ANALYTICS_EMPLOYEES = "analytics:employees:{}"  # analytics:employees:{date}
     ANALYTICS_HEALTH = "analytics:health"    # analytics:health
 
 # Global cache instance
@@ -188,6 +207,18 @@ def invalidate_token(token: str) -> bool:
     """Remove token from cache"""
     return cache.delete(CacheKeys.TOKEN.format(token))
 
+def get_cached_active_token() -> Optional[dict]:
+    """Get cached active token row"""
+    return cache.get(CacheKeys.ACTIVE_TOKEN)
+
+def set_cached_active_token(data: dict) -> bool:
+    """Cache active token row"""
+    return cache.set(CacheKeys.ACTIVE_TOKEN, data, CACHE_TTL_ACTIVE_TOKEN)
+
+def invalidate_active_token() -> bool:
+    """Remove active token from cache"""
+    return cache.delete(CacheKeys.ACTIVE_TOKEN)
+
 def get_cached_user(username: str) -> Optional[dict]:
     """Get cached user data"""
     return cache.get(CacheKeys.USER.format(username))
@@ -200,21 +231,27 @@ def invalidate_user(username: str) -> bool:
     """Remove user from cache"""
     return cache.delete(CacheKeys.USER.format(username))
 
+def analytics_day_ttl(date: str) -> int:
+    """TTL for per-date analytics: past UTC days are closed (events are only inserted at now)"""
+    if date < datetime.now(timezone.utc).date().isoformat():
+        return CACHE_TTL_ANALYTICS_CLOSED_DAY
+    return CACHE_TTL_ANALYTICS
+
 def get_cached_analytics_daily(date: str) -> Optional[dict]:
     """Get cached daily analytics"""
     return cache.get(CacheKeys.ANALYTICS_DAILY.format(date))
 
 def set_cached_analytics_daily(date: str, data: dict) -> bool:
     """Cache daily analytics"""
-    return cache.set(CacheKeys.ANALYTICS_DAILY.format(date), data, CACHE_TTL_ANALYTICS)
+    return cache.set(CacheKeys.ANALYTICS_DAILY.format(date), data, analytics_day_ttl(date))
 
-def get_cached_analytics_weekly() -> Optional[dict]:
-    """Get cached weekly analytics"""
-    return cache.get(CacheKeys.ANALYTICS_WEEKLY)
+def get_cached_analytics_weekly(start_date: str, end_date: str) -> Optional[list]:
+    """Get cached weekly analytics for a date range"""
+    return cache.get(CacheKeys.ANALYTICS_WEEKLY.format(start_date, end_date))
 
-def set_cached_analytics_weekly(data: dict) -> bool:
-    """Cache weekly analytics"""
-    return cache.set(CacheKeys.ANALYTICS_WEEKLY, data, CACHE_TTL_ANALYTICS)
+def set_cached_analytics_weekly(start_date: str, end_date: str, data: list) -> bool:
+    """Cache weekly analytics for a date range (closed once end_date is past)"""
+    return cache.set(CacheKeys.ANALYTICS_WEEKLY.format(start_date, end_date), data, analytics_day_ttl(end_date))
 
 def get_cached_analytics_location(date: str = None) -> Optional[list]:
     """Get cached location analytics"""
@@ -224,7 +261,7 @@ def get_cached_analytics_location(date: str = None) -> Optional[list]:
 def set_cached_analytics_location(data: list, date: str = None) -> bool:
     """Cache location analytics"""
     key = CacheKeys.ANALYTICS_LOCATION.format(date or "all")
-    return cache.set(key, data, CACHE_TTL_ANALYTICS)
+    return cache.set(key, data, analytics_day_ttl(date) if date else CACHE_TTL_ANALYTICS)
 
 def get_cached_analytics_users(limit: int = 10) -> Optional[list]:
     """Get cached user analytics"""
@@ -240,7 +277,36 @@ def get_cached_analytics_hourly(date: str) -> Optional[list]:
 
 def set_cached_analytics_hourly(date: str, data: list) -> bool:
     """Cache hourly analytics"""
-    return cache.set(CacheKeys.ANALYTICS_HOURLY.format(date), data, CACHE_TTL_ANALYTICS)
+    return cache.set(CacheKeys.ANALYTICS_HOURLY.format(date), data, analytics_day_ttl(date))
+
+def get_cached_employees_by_date(date: str) -> Optional[list]:
+    """Get cached list of employees who visited on a date"""
+    return cache.get(CacheKeys.ANALYTICS_EMPLOYEES.format(date))
+
+def set_cached_employees_by_date(date: str, data: list) -> bool:
+    """Cache list of employees who visited on a date (short TTL: it includes editable names)"""
+    return cache.set(CacheKeys.ANALYTICS_EMPLOYEES.format(date), data, CACHE_TTL_ANALYTICS)
+
+def invalidate_analytics_day(date: str) -> bool:
+    """Drop analytics that include a day that just got a new event
+
+    Per-date keys are known; weekly ranges containing the date and the
+    all-time top users (one key per limit) are found by prefix.
+    """
+    keys = [
+        CacheKeys.ANALYTICS_DAILY.format(date),
+        CacheKeys.ANALYTICS_HOURLY.format(date),
+        CacheKeys.ANALYTICS_LOCATION.format(date),
+        CacheKeys.ANALYTICS_LOCATION.format("all"),
+        CacheKeys.ANALYTICS_EMPLOYEES.format(date),
+    ]
+    weekly_prefix = CacheKeys.ANALYTICS_WEEKLY.format("", "")[:-1]  # analytics:weekly:
+    for key in cache.keys(weekly_prefix):
+        start_date, _, end_date = key[len(weekly_prefix):].partition(":")
+        if start_date <= date <= end_date:
+            keys.append(key)
+    keys.extend(cache.keys(CacheKeys.ANALYTICS_USER.format("")))
+    return cache.delete(*keys)
 
 def get_cached_system_health() -> Optional[dict]:
     """Get cached system health"""
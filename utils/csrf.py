@@ -48,6 +48,22 @@ def set_csrf_token(request: Request, token: Optional[str] = None) -> str:
     return token
 
 
+def ensure_csrf_token(request: Request) -> str:
+    """
+    Get the session CSRF token, creating one only if the session has none
+    
+    One token stays valid for the whole session, so page views reuse it
+    instead of generating a new one and re-signing the session cookie.
+    
+    Args:
+        request: FastAPI request object
+    
+    Returns:
+        The session CSRF token
+    """
+    return get_csrf_token(request) or set_csrf_token(request)
+
+
 def validate_csrf_token(request: Request, token: Optional[str] = None) -> bool:
     """
     Validate CSRF token
@@ -116,7 +132,8 @@ async def require_csrf_token(request: Request, form_token: Optional[str] = None)
         # Log CSRF failure
         try:
             from utils.logger import log_csrf_failure
-            client_ip = request.client.host if request.client else "unknown"
+            from utils.rate_limit import get_client_ip
+            client_ip = get_client_ip(request)
             endpoint = str(request.url.path)
             # Try to get user from session
             user = request.session.get("access_token")
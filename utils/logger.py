@@ -1,20 +1,25 @@
 """
 Logging system for the attendance application
 """
+import atexit
 import json
 import logging
 import logging.handlers
 import os
+import queue
 import sys
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+
+from config.config import LOG_QUEUE
 
 class JsonFormatter(logging.Formatter):
     """Simple JSON formatter for structured logs"""
 
     def format(self, record: logging.LogRecord) -> str:
         log_entry = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            # Время создания записи, а не форматирования (форматирует поток QueueListener)
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).replace(tzinfo=None).isoformat() + "Z",
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -28,6 +33,13 @@ class JsonFormatter(logging.Formatter):
         return json.dumps(log_entry, ensure_ascii=False)
 
 
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler for an in-process queue: records are enqueued as-is and formatted by the listener's handlers"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
 class Logger:
     """Centralized logging configuration"""
 
@@ -40,11 +52,36 @@ class Logger:
         'CRITICAL': logging.CRITICAL
     }
 
+    # Running QueueListener per logger name (stopped when the logger is set up again)
+    _listeners = {}
+
     def __init__(self, name: str = "attendance_system"):
         self.name = name
         self.logger = None
         self.setup_logging()
 
+    @classmethod
+    def _attach(cls, logger: logging.Logger, *handlers: logging.Handler) -> None:
+        """Attach handlers directly or, with LOG_QUEUE, behind a queue drained by a background thread
+
+        File/console writes then happen off the request path (event loop / bot polling loop).
+        """
+        previous = cls._listeners.pop(logger.name, None)
+        if previous is not None:
+            previous.stop()
+            for handler in previous.handlers:
+                handler.close()
+        logger.handlers.clear()
+        if not LOG_QUEUE:
+            for handler in handlers:
+                logger.addHandler(handler)
+            return
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        cls._listeners[logger.name] = listener
+        logger.addHandler(LocalQueueHandler(log_queue))
+
     def setup_logging(self):
         """Setup logging configuration"""
         # Create logs directory
@@ -59,9 +96,6 @@ class Logger:
         self.logger = logging.getLogger(self.name)
         self.logger.setLevel(log_level)
 
-        # Remove existing handlers
-        self.logger.handlers.clear()
-
         # Choose formatter (default JSON for structured logs)
         use_json = os.getenv("LOG_FORMAT", "json").lower() == "json"
         detailed_formatter = JsonFormatter() if use_json else logging.Formatter(
@@ -75,7 +109,6 @@ class Logger:
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setLevel(log_level)
         console_handler.setFormatter(simple_formatter)
-        self.logger.addHandler(console_handler)
 
         # File handler with rotation (detailed logs)
         file_handler = logging.handlers.RotatingFileHandler(
@@ -85,7 +118,6 @@ class Logger:
         )
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(detailed_formatter)
-        self.logger.addHandler(file_handler)
 
         # Error file handler
         error_handler = logging.handlers.RotatingFileHandler(
@@ -95,7 +127,7 @@ class Logger:
         )
         error_handler.setLevel(logging.ERROR)
         error_handler.setFormatter(detailed_formatter)
-        self.logger.addHandler(error_handler)
+        self._attach(self.logger, console_handler, file_handler, error_handler)
 
         # Telegram bot specific logger
         bot_logger = logging.getLogger("telegram_bot")
@@ -107,8 +139,7 @@ class Logger:
             backupCount=3
         )
         bot_handler.setFormatter(detailed_formatter)
-        bot_logger.addHandler(bot_handler)
-        bot_logger.addHandler(console_handler)  # Also log to console
+        self._attach(bot_logger, bot_handler, console_handler)  # Also log to console
 
     def get_logger(self) -> logging.Logger:
         """Get the configured logger"""
@@ -118,9 +149,17 @@ class Logger:
         """Get the Telegram bot specific logger"""
         return logging.getLogger("telegram_bot")
 
+    @classmethod
+    def stop_listeners(cls) -> None:
+        """Flush queued records and stop background listeners"""
+        while cls._listeners:
+            _, listener = cls._listeners.popitem()
+            listener.stop()
+
 # Global logger instance
 logger = Logger().get_logger()
 bot_logger = Logger().get_bot_logger()
+atexit.register(Logger.stop_listeners)
 
 def log_request(request, response=None, user=None):
     """Log HTTP request"""
@@ -18,6 +18,19 @@ from utils.cache import cache
 from utils.logger import log_performance
 
 
+# Metrics timestamps with 1s granularity: (unix second, ISO string)
+_iso_cache: tuple = (0, "")
+
+
+def iso_now() -> str:
+    """Current UTC time as ISO string, rebuilt at most once per second"""
+    global _iso_cache
+    now = int(time.time())
+    if now != _iso_cache[0]:
+        _iso_cache = (now, datetime.fromtimestamp(now, timezone.utc).isoformat())
+    return _iso_cache[1]
+
+
 def get_system_metrics() -> Dict[str, Any]:
     """
     Get system performance metrics
@@ -28,7 +41,7 @@ def get_system_metrics() -> Dict[str, Any]:
     if not PSUTIL_AVAILABLE:
         return {
             "error": "psutil not installed (optional dependency)",
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": iso_now()
         }
     
     try:
@@ -65,12 +78,12 @@ def get_system_metrics() -> Dict[str, Any]:
                 "total_gb": round(disk_total_gb, 2),
                 "used_gb": round((disk.total - disk.free) / (1024 * 1024 * 1024), 2)
             },
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": iso_now()
         }
     except Exception as e:
         return {
             "error": str(e),
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": iso_now()
         }
 
 
@@ -85,7 +98,7 @@ def get_redis_metrics() -> Dict[str, Any]:
     metrics = {
         "enabled": REDIS_ENABLED,
         "connected": False,
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "timestamp": iso_now()
     }
     
     if not REDIS_ENABLED:
@@ -130,7 +143,7 @@ def get_database_metrics(db) -> Dict[str, Any]:
     """
     metrics = {
         "status": "unknown",
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "timestamp": iso_now()
     }
     
     try:
@@ -151,22 +164,13 @@ def get_database_metrics(db) -> Dict[str, Any]:
                 "exists": False
             })
         
-        # Test connection
+        # Test connection: the table count query doubles as the connectivity probe
         with db.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
+            cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='table'")
+            metrics["table_count"] = cursor.fetchone()[0]
             metrics["status"] = "healthy"
             metrics["connection_test"] = "success"
-        
-        # Get table counts
-        try:
-            with db.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='table'")
-                metrics["table_count"] = cursor.fetchone()[0]
-        except:
-            pass
             
     except Exception as e:
         metrics.update({
@@ -0,0 +1,34 @@
+"""
+Optional request profiling with pyinstrument (dev/staging only)
+"""
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import HTMLResponse
+
+
+class ProfilerMiddleware(BaseHTTPMiddleware):
+    """
+    Profile a single request when it carries ?profile=1
+
+    The call tree is returned as pyinstrument HTML instead of the normal
+    response. Only added when PROFILING_ENABLED is set, so production
+    requests never pass through it.
+    """
+
+    def __init__(self, app, interval: float = 0.0005):
+        super().__init__(app)
+        # Imported lazily: pyinstrument is a dev dependency (requirements-dev.txt)
+        from pyinstrument import Profiler
+        self._profiler_cls = Profiler
+        self.interval = interval
+
+    async def dispatch(self, request: Request, call_next):
+        if request.query_params.get("profile") != "1":
+            return await call_next(request)
+        profiler = self._profiler_cls(interval=self.interval, async_mode="enabled")
+        profiler.start()
+        try:
+            await call_next(request)
+        finally:
+            profiler.stop()
+        return HTMLResponse(profiler.output_html())
@@ -1,6 +1,7 @@
 """
 Rate limiting utilities for API endpoints
 """
+import ipaddress
 import time
 from typing import Optional
 from fastapi import Request, HTTPException
@@ -9,15 +10,43 @@ from utils.cache import cache
 from utils.logger import log_error
 
 
+# Docker/local networks a reverse proxy can sit in (is_private would also admit
+# TEST-NET and other reserved ranges)
+TRUSTED_PROXY_NETWORKS = tuple(ipaddress.ip_network(net) for net in (
+    "127.0.0.0/8", "10.0.0.0/8", "172.16.0.0/12", "192.168.0.0/16", "::1/128",
+))
+
+
+def is_trusted_proxy(ip: str) -> bool:
+    """Check if IP belongs to a trusted proxy (Docker/local network)"""
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(addr in net for net in TRUSTED_PROXY_NETWORKS)
+
+
 def get_client_ip(request: Request) -> str:
-    """Get client IP address from request"""
-    if request.client:
-        return request.client.host
-    # Try to get from X-Forwarded-For header (for reverse proxy)
-    forwarded = request.headers.get("X-Forwarded-For")
-    if forwarded:
-        return forwarded.split(",")[0].strip()
-    return "unknown"
+    """Get client IP address from request
+
+    X-Forwarded-For is only honoured when the direct peer is a trusted reverse
+    proxy (Angie/Docker network); otherwise every client behind the proxy would
+    share the proxy's address and one rate-limit bucket. Proxies append to the
+    header, so its left-most entries are client-controlled: the list is walked
+    from the right and the first hop that is not a trusted proxy is the client.
+    """
+    host = request.client.host if request.client else None
+    if host is None or is_trusted_proxy(host):
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded:
+            hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+            for hop in reversed(hops):
+                if not is_trusted_proxy(hop):
+                    return hop
+            # Вся цепочка внутри сети — берём самый дальний адрес
+            if hops:
+                return hops[0]
+    return host or "unknown"
 
 
 def rate_limit(
@@ -49,18 +78,20 @@ def rate_limit(
             key_block = f"{key_prefix}:block:{client_ip}"
             key_counter = f"{key_prefix}:count:{client_ip}"
             
-            # Check if blocked
-            if cache.redis_client.exists(key_block):
+            # Block check + INCR + EXPIRE NX in one round-trip; the window starts
+            # at the first request without a separate "count == 1" call
+            pipe = cache.redis_client.pipeline(transaction=False)
+            pipe.exists(key_block)
+            pipe.incr(key_counter)
+            pipe.expire(key_counter, window_seconds, nx=True)
+            blocked, count, _ = pipe.execute()
+
+            if blocked:
                 raise HTTPException(
                     status_code=429,
                     detail=f"Слишком много запросов. Попробуйте позже (блокировка на {block_seconds} секунд)."
                 )
             
-            # Increment counter
-            count = cache.redis_client.incr(key_counter)
-            if count == 1:
-                cache.redis_client.expire(key_counter, window_seconds)
-            
             # Check if limit exceeded
             if count > max_requests:
                 cache.redis_client.set(key_block, 1, ex=block_seconds)
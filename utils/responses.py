@@ -0,0 +1,23 @@
+"""
+JSON response classes
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+class AnalyticsJSONResponse(ORJSONResponse):
+    """
+    orjson response for analytics payloads
+
+    Returned directly from the handler, so FastAPI skips jsonable_encoder
+    and the dict goes straight to orjson. Non-str keys (hour numbers,
+    dates) are allowed; datetimes are emitted as RFC 3339 with a Z suffix.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+        )
@@ -0,0 +1,82 @@
+"""
+Session middleware with verified-cookie cache
+"""
+import json
+import time
+from base64 import b64decode, b64encode
+from cachetools import TTLCache
+from itsdangerous.exc import BadSignature
+from starlette.datastructures import MutableHeaders
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.requests import HTTPConnection
+from starlette.types import Message, Receive, Scope, Send
+
+
+class CachedSessionMiddleware(SessionMiddleware):
+    """
+    Starlette SessionMiddleware that skips repeated signature work
+
+    Terminals poll with the same cookie every few seconds: the unsigned
+    payload of a recently seen cookie is reused instead of re-checking
+    the HMAC, and an unchanged session is not re-signed on the response
+    (the cookie is only refreshed after half of max_age has passed).
+    """
+
+    def __init__(self, app, *args, cache_size: int = 4096, cache_ttl: int = 300, **kwargs):
+        super().__init__(app, *args, **kwargs)
+        # cookie value -> (decoded json bytes, signed_at)
+        self._verified = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._refresh_after = (self.max_age or 0) / 2
+
+    def _load(self, cookie: str):
+        """Return (json bytes, signed_at) for a valid cookie or None"""
+        entry = self._verified.get(cookie)
+        if entry is not None:
+            if self.max_age and time.time() - entry[1] > self.max_age:
+                self._verified.pop(cookie, None)
+                return None
+            return entry
+        try:
+            value, signed_at = self.signer.unsign(
+                cookie.encode("utf-8"), max_age=self.max_age, return_timestamp=True
+            )
+        except BadSignature:
+            return None
+        entry = (b64decode(value), signed_at.timestamp())
+        self._verified[cookie] = entry
+        return entry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        connection = HTTPConnection(scope)
+        cookie = connection.cookies.get(self.session_cookie)
+        entry = self._load(cookie) if cookie else None
+        raw, signed_at = entry if entry else (None, 0.0)
+        scope["session"] = json.loads(raw) if raw is not None else {}
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                session = scope["session"]
+                if session:
+                    data = json.dumps(session).encode("utf-8")
+                    fresh = not self.max_age or time.time() - signed_at < self._refresh_after
+                    if data != raw or not fresh:
+                        signed = self.signer.sign(b64encode(data)).decode("utf-8")
+                        max_age = f"Max-Age={self.max_age}; " if self.max_age else ""
+                        MutableHeaders(scope=message).append(
+                            "Set-Cookie",
+                            f"{self.session_cookie}={signed}; path={self.path}; {max_age}{self.security_flags}",
+                        )
+                elif raw is not None:
+                    # Сессия очищена (logout)
+                    MutableHeaders(scope=message).append(
+                        "Set-Cookie",
+                        f"{self.session_cookie}=null; path={self.path}; "
+                        f"expires=Thu, 01 Jan 1970 00:00:00 GMT; {self.security_flags}",
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
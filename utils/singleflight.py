@@ -0,0 +1,51 @@
+"""
+Single-flight: одновременные одинаковые вызовы выполняются один раз
+"""
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key
+
+    Sync handlers run in the threadpool, so N dashboard refreshes of the
+    same report would otherwise run N identical queries. The first caller
+    runs the function; callers arriving while it is in flight wait on the
+    same Future and get its result (or exception). Nothing is kept once
+    the call finishes — caching stays the job of utils.cache.
+
+    max_concurrent caps how many distinct keys run at once (followers
+    never take a slot); extra leaders block until one is released.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None):
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            if self._slots is None:
+                result = fn(*args, **kwargs)
+            else:
+                with self._slots:
+                    result = fn(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
@@ -5,6 +5,11 @@ import re
 from typing import Optional, Tuple
 
 
+# Стандартный набор ролей (порядок — для сообщения об ошибке) и множество для проверки
+DEFAULT_ROLES = ("user", "admin", "manager", "hr", "terminal")
+_DEFAULT_ROLE_SET = frozenset(DEFAULT_ROLES)
+
+
 class ValidationError(Exception):
     """Исключение для ошибок валидации"""
     pass
@@ -227,7 +232,9 @@ def validate_role(role: str, allowed_roles: list[str] = None) -> Tuple[bool, Opt
         return False, "Роль не может быть пустой"
     
     if allowed_roles is None:
-        allowed_roles = ["user", "admin", "manager", "hr", "terminal"]
+        if role in _DEFAULT_ROLE_SET:
+            return True, None
+        allowed_roles = DEFAULT_ROLES
     
     if role not in allowed_roles:
         return False, f"Недопустимая роль. Разрешенные роли: {', '.join(allowed_roles)}"